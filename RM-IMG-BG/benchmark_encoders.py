@@ -0,0 +1,61 @@
+import os
+import time
+
+from PIL import Image
+
+from bg_encode import encode
+
+# (label, output format, encoder options) compared by the benchmark
+BENCHMARK_CASES = [
+    ("png level 6 (default)", "png", {"level": 6}),
+    ("png level 1", "png", {"level": 1}),
+    ("png optimized", "png-optimized", {}),
+    ("png quantized", "png-quantized", {}),
+    ("cv2 png level 1", "cv2-png", {"level": 1}),
+    ("cv2 png level 3", "cv2-png", {"level": 3}),
+    ("webp lossless", "webp-lossless", {"method": 0}),
+    ("webp q90", "webp", {"quality": 90}),
+    ("cv2 webp q90", "cv2-webp", {"quality": 90}),
+]
+
+
+def benchmark_encoders(image_dir, cases=BENCHMARK_CASES, repeat=3):
+    """
+    Encode every image in image_dir (ideally results of the background remover, so
+    the alpha channel is realistic) with each case, and print ms and KB per image.
+    """
+    # Step 1: Decode everything up front so only encoding is timed
+    images = []
+    for file_name in sorted(os.listdir(image_dir)):
+        try:
+            with Image.open(os.path.join(image_dir, file_name)) as img:
+                images.append(img.convert("RGBA"))
+        except OSError:
+            continue  # Not an image
+    if not images:
+        print(f"No images found in {image_dir}")
+        return
+
+    print(f"{len(images)} images, best of {repeat} runs")
+    print(f"{'encoder':<24}{'ms/image':>10}{'KB/image':>10}")
+
+    # Step 2: Time each case, keeping the fastest run
+    for label, output_format, options in cases:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            total_bytes = sum(len(encode(img, output_format, **options)) for img in images)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{label:<24}{best * 1000 / len(images):>10.1f}{total_bytes / 1024 / len(images):>10.1f}")
+
+
+def main():
+    image_dir = " "  # Folder of sample images (e.g. an output folder of comQ_Batch_IMG_bg-remove.py)
+    repeat = 3  # Runs per encoder, the fastest one is reported
+
+    benchmark_encoders(image_dir, BENCHMARK_CASES, repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import math
+import time
+import queue
+import itertools
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# Images per forward pass (one NCHW batch)
+BATCH_SIZE = 8
+
+# When images trickle in, wait at most this long for a batch to fill up
+BATCH_WAIT = 0.5
+
+# Normalization of the u2net family of models (what rembg uses for them)
+MODEL_MEAN = (0.485, 0.456, 0.406)
+MODEL_STD = (0.229, 0.224, 0.225)
+
+# rembg models that share that normalization, a 320x320 input and one mask as output 0;
+# the batched path reimplements their preprocessing, so it only accepts these
+U2NET_FAMILY = ("u2net", "u2netp", "u2net_human_seg", "silueta")
+
+
+def has_alpha(img):
+    return img.mode in ("RGBA", "LA", "PA", "RGBa", "La") or "transparency" in img.info
+
+
+def load_image(path):
+    """
+    Decode an image and apply its EXIF rotation, like rembg.remove does.
+    Images with transparency stay RGBA so cutout() can keep their alpha.
+    """
+    with Image.open(path) as img:
+        img = ImageOps.exif_transpose(img)
+        return img.convert("RGBA" if has_alpha(img) else "RGB")
+
+
+def model_input(session):
+    """Input name, fixed batch size (None if dynamic) and (width, height) of the model."""
+    model_name = getattr(session, "model_name", None)
+    if model_name not in U2NET_FAMILY:
+        raise ValueError(f"Batched inference only supports the u2net family {U2NET_FAMILY}, "
+                         f"not {model_name!r}; use batch size 1 for other models")
+    model_in = session.inner_session.get_inputs()[0]
+    batch, _, height, width = model_in.shape
+    fixed_batch = batch if isinstance(batch, int) and batch > 0 else None
+    return model_in.name, fixed_batch, (width, height)
+
+
+def to_tensor(img, size):
+    """Resize to the model input and normalize into a CHW float32 array."""
+    im_ary = np.asarray(img.convert("RGB").resize(size, Image.Resampling.LANCZOS), dtype=np.float32)
+    im_ary /= max(float(im_ary.max()), 1e-6)
+    im_ary = (im_ary - np.array(MODEL_MEAN, dtype=np.float32)) / np.array(MODEL_STD, dtype=np.float32)
+    return im_ary.transpose((2, 0, 1))
+
+
+def predict_masks(session, images):
+    """
+    Segment every image with as few forward passes as possible and return one
+    "L" mask per image, resized back to that image's size.
+    """
+    input_name, fixed_batch, size = model_input(session)
+    step = fixed_batch or len(images)  # Models exported with batch 1 still work, one at a time
+
+    masks = []
+    for start in range(0, len(images), step):
+        chunk = images[start:start + step]
+        batch = np.stack([to_tensor(img, size) for img in chunk])
+        pred = session.inner_session.run(None, {input_name: batch})[0][:, 0, :, :]
+
+        for img, img_pred in zip(chunk, pred):
+            # Min-max scale each mask on its own, as a single-image pass would
+            low, high = img_pred.min(), img_pred.max()
+            img_pred = (img_pred - low) / max(high - low, 1e-6)
+            mask = Image.fromarray((img_pred.clip(0, 1) * 255).astype(np.uint8), mode="L")
+            masks.append(mask.resize(img.size, Image.Resampling.LANCZOS))
+    return masks
+
+
+def cutout(img, mask):
+    """
+    Keep the pixels of img where the mask is set, transparent elsewhere. Like rembg's
+    naive_cutout, an alpha channel img already has is multiplied by the mask.
+    """
+    empty = Image.new("RGBA", img.size, 0)
+    return Image.composite(img.convert("RGBA"), empty, mask)
+
+
+def split_batches(items, batch_size=BATCH_SIZE, workers=1):
+    """
+    Split a known list of items into batches of at most batch_size, using smaller
+    batches when there are too few items to give every worker a full one.
+    """
+    items = list(items)
+    if not items:
+        return []
+    size = max(1, min(batch_size, math.ceil(len(items) / workers)))
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def stream_batches(items, batch_size=BATCH_SIZE, workers=1):
+    """
+    split_batches for an iterator of unknown length: batches are yielded as items arrive.
+    Only when the whole input fits in one round (workers x batch_size) are batches shrunk.
+    """
+    items = iter(items)
+    head = list(itertools.islice(items, batch_size * workers))
+    if len(head) < batch_size * workers:
+        yield from split_batches(head, batch_size, workers)
+        return
+    for start in range(0, len(head), batch_size):
+        yield head[start:start + batch_size]
+    while True:
+        batch = list(itertools.islice(items, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def collect_batch(source, batch_size=BATCH_SIZE, max_wait=BATCH_WAIT):
+    """
+    Take up to batch_size items from a queue.Queue. Blocks for the first item, then
+    waits at most max_wait for more, so a slow trickle still gets processed promptly.
+    A None item (end of input) is put back for the next caller and ends the batch.
+    """
+    batch = [source.get()]
+    if batch[0] is None:
+        source.put(None)
+        return []
+
+    deadline = time.monotonic() + max_wait
+    while len(batch) < batch_size:
+        try:
+            item = source.get(timeout=max(0, deadline - time.monotonic()))
+        except queue.Empty:
+            break
+        if item is None:
+            source.put(None)
+            break
+        batch.append(item)
+    return batch
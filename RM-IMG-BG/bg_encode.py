@@ -0,0 +1,100 @@
+import io
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Encoder used for results (see ENCODERS); "png" with level 6 is Pillow's default PNG
+OUTPUT_FORMAT = "png"
+
+# zlib level of the PNG encoders: 1 is several times faster than 6, files ~10-20% bigger
+PNG_LEVEL = 6
+
+# Palette size of "png-quantized" (alpha is kept in the palette)
+QUANTIZE_COLORS = 256
+
+# Lossy WebP quality (alpha stays lossless) and effort (0 = fastest, 6 = smallest)
+WEBP_QUALITY = 90
+WEBP_METHOD = 4
+
+
+def _pillow(img, fmt, **params):
+    buffer = io.BytesIO()
+    img.save(buffer, fmt, **params)
+    return buffer.getvalue()
+
+
+def _bgra(img):
+    return cv2.cvtColor(np.asarray(img.convert("RGBA")), cv2.COLOR_RGBA2BGRA)
+
+
+def _cv2(extension, img, params):
+    ok, buffer = cv2.imencode(extension, _bgra(img), params)
+    if not ok:
+        raise ValueError(f"OpenCV could not encode {extension}")
+    return buffer.tobytes()
+
+
+def encode_png(img, level=PNG_LEVEL):
+    return _pillow(img, "PNG", compress_level=level)
+
+
+def encode_png_optimized(img):
+    """Smallest lossless PNG Pillow makes (tries every filter, level 9); slowest."""
+    return _pillow(img, "PNG", optimize=True)
+
+
+def encode_png_quantized(img, colors=QUANTIZE_COLORS, level=PNG_LEVEL):
+    """8-bit palette PNG: lossy, but often a third of the size and quick to write."""
+    return _pillow(img.quantize(colors, method=Image.Quantize.FASTOCTREE), "PNG", compress_level=level)
+
+
+def encode_webp_lossless(img, method=WEBP_METHOD):
+    return _pillow(img, "WEBP", lossless=True, method=method)
+
+
+def encode_webp(img, quality=WEBP_QUALITY, method=WEBP_METHOD):
+    return _pillow(img, "WEBP", quality=quality, method=method)
+
+
+def encode_cv2_png(img, level=PNG_LEVEL):
+    return _cv2(".png", img, [cv2.IMWRITE_PNG_COMPRESSION, level])
+
+
+def encode_cv2_webp(img, quality=WEBP_QUALITY):
+    return _cv2(".webp", img, [cv2.IMWRITE_WEBP_QUALITY, quality])
+
+
+# Format -> (file extension, encoder). PNG results keep the input's extension in their
+# name (extension None), as they always have
+ENCODERS = {
+    "png": (None, encode_png),
+    "png-optimized": (None, encode_png_optimized),
+    "png-quantized": (None, encode_png_quantized),
+    "cv2-png": (None, encode_cv2_png),
+    "webp-lossless": (".webp", encode_webp_lossless),
+    "webp": (".webp", encode_webp),
+    "cv2-webp": (".webp", encode_cv2_webp),
+}
+
+
+def _encoder(output_format):
+    try:
+        return ENCODERS[output_format]
+    except KeyError:
+        raise ValueError(f"Unknown output format: {output_format} (choose from {', '.join(ENCODERS)})")
+
+
+def output_extension(output_format=OUTPUT_FORMAT):
+    """Extension results of this format are saved with, or None to keep the input's."""
+    return _encoder(output_format)[0]
+
+
+def encode(img, output_format=OUTPUT_FORMAT, **options):
+    """Encode an RGBA image to bytes; options override the module defaults (e.g. level=1)."""
+    return _encoder(output_format)[1](img, **options)
+
+
+def save_image(img, output_path, output_format=OUTPUT_FORMAT):
+    with open(output_path, "wb") as output_file:
+        output_file.write(encode(img, output_format))
@@ -0,0 +1,109 @@
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+from bg_batch import cutout, has_alpha
+
+# Longest side the mask is computed at. Bigger inputs are decoded reduced
+# (JPEG decodes straight at 1/2, 1/4 or 1/8 scale) and only the mask is scaled up.
+# 0 = off: masks at full resolution, as before. Opt in with e.g. 1024 for big inputs,
+# at the cost of slightly softer mask edges
+PREVIEW_SIDE = 0
+
+# Guided filter used to scale the mask up along the edges of the full image
+GUIDE_RADIUS = 8  # Window radius, in preview pixels
+GUIDE_EPS = 1e-3  # Smaller follows image edges more closely, larger smooths more
+
+# Full-resolution rows handled per step (bounds the float buffers to a strip)
+STRIP_ROWS = 512
+
+# EXIF orientations that swap width and height
+_ROTATED = (5, 6, 7, 8)
+
+
+def load_preview(path, max_side):
+    """Decode an image at no more than max_side pixels on its longest side, EXIF-rotated (RGBA if it has alpha)."""
+    with Image.open(path) as img:
+        img.draft("RGB", (max_side, max_side))  # JPEG only; other formats ignore it
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGBA" if has_alpha(img) else "RGB")
+    img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    return img
+
+
+def full_size(img):
+    """Size of an opened (not yet decoded) image once its EXIF rotation is applied."""
+    width, height = img.size
+    if img.getexif().get(0x0112) in _ROTATED:
+        return height, width
+    return width, height
+
+
+def guided_coefficients(preview, mask, radius=GUIDE_RADIUS, eps=GUIDE_EPS):
+    """
+    Linear coefficients (a, b) of a guided filter with the preview as guide, so that
+    alpha ~= a * gray + b holds locally. Computed at preview size (fast guided filter).
+    """
+    guide = np.asarray(preview.convert("L"), dtype=np.float32) / 255
+    alpha = np.asarray(mask, dtype=np.float32) / 255
+    window = (2 * radius + 1, 2 * radius + 1)
+
+    mean_guide = cv2.boxFilter(guide, -1, window)
+    mean_alpha = cv2.boxFilter(alpha, -1, window)
+    covariance = cv2.boxFilter(guide * alpha, -1, window) - mean_guide * mean_alpha
+    variance = cv2.boxFilter(guide * guide, -1, window) - mean_guide * mean_guide
+
+    a = covariance / (variance + eps)
+    b = mean_alpha - a * mean_guide
+    return cv2.boxFilter(a, -1, window), cv2.boxFilter(b, -1, window)
+
+
+def upsample_mask(preview, mask, image):
+    """
+    Scale a preview-sized mask up to image's size, following the edges of the full
+    image. Works a strip of rows at a time; returns a uint8 alpha array.
+    """
+    a, b = guided_coefficients(preview, mask)
+    b *= 255  # alpha = a * gray + 255 * b, with gray in 0-255
+    gray = np.asarray(image.convert("L"))
+    height, width = gray.shape
+    scale_x = a.shape[1] / width
+    scale_y = a.shape[0] / height
+
+    alpha = np.empty((height, width), dtype=np.uint8)
+    for top in range(0, height, STRIP_ROWS):
+        rows = min(STRIP_ROWS, height - top)
+        # Bilinear resize of the rows [top, top + rows) only, pixel centres aligned
+        matrix = np.float32([
+            [scale_x, 0, 0.5 * scale_x - 0.5],
+            [0, scale_y, (top + 0.5) * scale_y - 0.5],
+        ])
+        flags = cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP
+        strip_a = cv2.warpAffine(a, matrix, (width, rows), flags=flags, borderMode=cv2.BORDER_REPLICATE)
+        strip_b = cv2.warpAffine(b, matrix, (width, rows), flags=flags, borderMode=cv2.BORDER_REPLICATE)
+        strip_a *= gray[top:top + rows]
+        strip_a += strip_b
+        np.clip(strip_a, 0, 255, out=strip_a)
+        alpha[top:top + rows] = strip_a
+    return alpha
+
+
+def full_res_cutout(path, preview, mask):
+    """
+    Cut out the full-resolution image at path with a mask computed on its preview.
+    Images that were small enough to be their own preview are composited directly.
+    """
+    with Image.open(path) as img:
+        if full_size(img) == preview.size:
+            return cutout(preview, mask)
+        image = ImageOps.exif_transpose(img)
+        image = image.convert("RGBA" if has_alpha(image) else "RGB")
+
+    # One pass: the upsampled mask becomes the alpha channel of the full image,
+    # multiplied into the alpha it already had (as cutout() does)
+    alpha = upsample_mask(preview, mask, image)
+    if image.mode == "RGBA":
+        own_alpha = np.asarray(image.getchannel("A"), dtype=np.uint16)
+        alpha = ((own_alpha * alpha + 127) // 255).astype(np.uint8)
+    image.putalpha(Image.fromarray(alpha, "L"))
+    return image
@@ -0,0 +1,151 @@
+import os
+import queue
+import threading
+
+from PIL import Image
+
+from bg_batch import collect_batch, BATCH_SIZE
+
+# Memory the images in flight may take together; admission of new images waits below it
+MEMORY_BUDGET = 2 * 1024 ** 3
+
+# Estimated peak bytes per pixel of one image: RGB decode (3), RGBA result (4),
+# post-processing copy (4) and alpha (1)
+BYTES_PER_PIXEL = 12
+
+# Items that may wait between two stages (the memory budget is the real limit)
+QUEUE_SIZE = 8
+
+# Threads decoding inputs and threads cutting out / post-processing / encoding results
+DECODE_THREADS = 2
+FINISH_THREADS = max(1, (os.cpu_count() or 1) // 2)
+
+
+class MemoryBudget:
+    """Counts the estimated bytes of images in flight and blocks admission over the limit."""
+
+    def __init__(self, limit=MEMORY_BUDGET):
+        self.limit = limit
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, amount):
+        with self._cond:
+            # An image bigger than the whole budget is still let in, on its own
+            while self.used and self.used + amount > self.limit:
+                self._cond.wait()
+            self.used += amount
+
+    def release(self, amount):
+        with self._cond:
+            self.used -= amount
+            self._cond.notify_all()
+
+
+def image_cost(input_path):
+    """Estimated peak memory of processing an image, from its header only."""
+    with Image.open(input_path) as img:
+        width, height = img.size
+    return width * height * BYTES_PER_PIXEL
+
+
+def run_pipeline(tasks, decode, infer, finish, batch_size=BATCH_SIZE, memory_budget=MEMORY_BUDGET,
+                 decode_threads=DECODE_THREADS, finish_threads=FINISH_THREADS, on_done=None):
+    """
+    Process (input_path, output_path) tasks in three stages connected by bounded queues:
+      decode(task) -> item, on decode_threads threads
+      infer(items) -> one result per item, on one thread, batch_size items at a time
+      finish(task, item, result), on finish_threads threads (cut out, post-process, save)
+    A task is only admitted once its estimated memory fits in memory_budget, and its share
+    is given back after finish, so peak memory follows the budget, not the input size.
+    on_done(task) is called for every task that finished without an error.
+    """
+    budget = MemoryBudget(memory_budget)
+    decode_queue = queue.Queue(QUEUE_SIZE)
+    infer_queue = queue.Queue(QUEUE_SIZE)
+    finish_queue = queue.Queue(QUEUE_SIZE)
+    decoders_left = [decode_threads]
+    decoders_lock = threading.Lock()
+
+    def fail(task, cost, e):
+        print(f"Error processing {task[0]}: {e}")
+        budget.release(cost)
+
+    # Step 1: Admit tasks while they fit in the memory budget
+    def admit():
+        try:
+            for task in tasks:
+                try:
+                    cost = image_cost(task[0])
+                except Exception as e:
+                    print(f"Error processing {task[0]}: {e}")
+                    continue
+                budget.acquire(cost)
+                decode_queue.put((task, cost))
+        finally:
+            for _ in range(decode_threads):
+                decode_queue.put(None)  # Always close the stages, even if listing the tasks failed
+
+    # Step 2: Decode
+    def decode_worker():
+        while True:
+            job = decode_queue.get()
+            if job is None:
+                break
+            task, cost = job
+            try:
+                infer_queue.put((task, cost, decode(task)))
+            except Exception as e:
+                fail(task, cost, e)
+        with decoders_lock:
+            decoders_left[0] -= 1
+            if not decoders_left[0]:
+                infer_queue.put(None)  # Last decoder out closes the inference stage
+
+    # Step 3: Inference, batching whatever is ready
+    def infer_worker():
+        while True:
+            batch = collect_batch(infer_queue, batch_size)
+            if not batch:
+                break
+            try:
+                results = infer([item for _, _, item in batch])
+            except Exception as e:
+                for task, cost, _ in batch:
+                    fail(task, cost, e)
+                continue
+            for (task, cost, item), result in zip(batch, results):
+                finish_queue.put((task, cost, item, result))
+        for _ in range(finish_threads):
+            finish_queue.put(None)
+
+    # Step 4: Cut out, post-process and encode, then give the memory back
+    def finish_worker():
+        while True:
+            job = finish_queue.get()
+            if job is None:
+                break
+            task, cost, item, result = job
+            del job
+            try:
+                finish(task, item, result)
+            except Exception as e:
+                fail(task, cost, e)
+                continue
+            del item, result
+            budget.release(cost)
+            # A failing callback must not stop this worker, or the stage would stall
+            try:
+                if on_done is not None:
+                    on_done(task)
+            except Exception as e:
+                print(f"Error processing {task[0]}: {e}")
+
+    threads = [threading.Thread(target=admit)]
+    threads += [threading.Thread(target=decode_worker) for _ in range(decode_threads)]
+    threads += [threading.Thread(target=infer_worker)]
+    threads += [threading.Thread(target=finish_worker) for _ in range(finish_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
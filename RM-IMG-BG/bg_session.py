@@ -0,0 +1,69 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import onnxruntime as ort
+from rembg import new_session
+
+# rembg model used for every image (u2net is rembg's classic general-purpose model)
+MODEL_NAME = "u2net"
+
+# ONNX threads per worker process. Workers x threads is kept at the core count,
+# so processes never fight each other for cores
+THREADS_PER_WORKER = 1
+
+# One session per process: loaded once by the pool initializer (or on first use)
+_session = None
+_session_lock = threading.Lock()
+
+
+def plan_workers(workers=None, threads_per_worker=THREADS_PER_WORKER):
+    """Return (workers, threads_per_worker) so that together they match the core count."""
+    cores = os.cpu_count() or 1
+    threads_per_worker = max(1, min(threads_per_worker, cores))
+    if workers is None:
+        workers = max(1, cores // threads_per_worker)
+    return workers, threads_per_worker
+
+
+def session_options(intra_op_threads, inter_op_threads=1):
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    return options
+
+
+def init_worker(model_name=MODEL_NAME, threads=THREADS_PER_WORKER):
+    """Process pool initializer: pin the thread pools, then load the model once."""
+    global _session
+    cv2.setNumThreads(threads)  # OpenCV would otherwise start a thread per core in every worker
+    _session = new_session(model_name, sess_opts=session_options(threads))
+
+
+def process_pool(workers=None, threads_per_worker=THREADS_PER_WORKER, model_name=MODEL_NAME):
+    """
+    Process pool whose workers each hold one warm model session.
+    Workers are spawned, not forked: forking a process that already loaded
+    rembg/onnxruntime can hang, and spawn is what Windows does anyway.
+    """
+    workers, threads_per_worker = plan_workers(workers, threads_per_worker)
+    print(f"Using {workers} worker processes x {threads_per_worker} ONNX threads.")
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(model_name, threads_per_worker),
+    )
+
+
+def get_session(model_name=MODEL_NAME):
+    """Session of this process, loaded on first use with every core (thread mode)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = new_session(model_name, sess_opts=session_options(os.cpu_count() or 1))
+    return _session
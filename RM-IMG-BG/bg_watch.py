@@ -0,0 +1,112 @@
+import os
+import time
+import threading
+
+# Optional dependency, only needed for watch mode (inotify on Linux, FSEvents/ReadDirectoryChangesW elsewhere)
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+from file_discovery import IMAGE_EXTENSIONS
+
+# A file is handed over once it has had no events and kept the same size/mtime this long
+DEBOUNCE = 1.0
+
+# How often pending files are checked
+POLL_INTERVAL = 0.2
+
+
+def _require_watchdog():
+    if Observer is None:
+        raise ImportError("Watch mode needs the watchdog package (pip install watchdog)")
+
+
+class _Events(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        self.watcher.touch(event.src_path)
+
+    def on_modified(self, event):
+        self.watcher.touch(event.src_path)
+
+    def on_closed(self, event):
+        self.watcher.touch(event.src_path)
+
+    def on_moved(self, event):
+        self.watcher.touch(event.dest_path)
+
+
+class FolderWatcher:
+    """
+    Watches a folder and puts the path of every new or changed image on ready_queue once
+    it has stopped changing, so files that are still being uploaded are never picked up.
+    """
+
+    def __init__(self, folder, ready_queue, extensions=IMAGE_EXTENSIONS, ignore=(), debounce=DEBOUNCE):
+        _require_watchdog()
+        self.folder = folder
+        self.ready_queue = ready_queue
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.ignore = [os.path.abspath(path) for path in ignore]
+        self.debounce = debounce
+        self._lock = threading.Lock()
+        self._pending = {}  # path -> (time of last event, (size, mtime_ns) when last seen)
+        self._stopped = threading.Event()
+        self._observer = Observer()
+        self._settler = threading.Thread(target=self._settle, daemon=True)
+
+    def touch(self, path):
+        """Note activity on path; it is handed over after debounce seconds of quiet."""
+        if not path.lower().endswith(self.extensions):
+            return
+        path = os.path.abspath(path)
+        if any(path.startswith(folder + os.sep) for folder in self.ignore):
+            return  # e.g. our own output folder inside the watched one
+        with self._lock:
+            seen = self._pending.get(path, (0, None))[1]
+            self._pending[path] = (time.monotonic(), seen)
+
+    def _settle(self):
+        while not self._stopped.wait(POLL_INTERVAL):
+            now = time.monotonic()
+            with self._lock:
+                due = [(path, last, seen) for path, (last, seen) in self._pending.items() if now - last >= self.debounce]
+
+            for path, last, seen in due:
+                try:
+                    stat = os.stat(path)
+                    current = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    current = None  # Deleted or renamed away
+                with self._lock:
+                    if self._pending.get(path, (None,))[0] != last:
+                        continue  # Touched again meanwhile, its newer event restarts the wait
+                    if current is None:
+                        del self._pending[path]
+                    elif current != seen:
+                        self._pending[path] = (time.monotonic(), current)  # Still growing, wait another round
+                    else:
+                        del self._pending[path]
+                        self.ready_queue.put(path)
+
+    def start(self, scan_existing=True):
+        """Start watching; with scan_existing, images already in the folder are queued too."""
+        self._observer.schedule(_Events(self), self.folder, recursive=False)
+        self._observer.start()
+        self._settler.start()
+        if scan_existing:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        self.touch(entry.path)
+
+    def stop(self):
+        self._stopped.set()
+        self._observer.stop()
+        self._observer.join()
+        self._settler.join()
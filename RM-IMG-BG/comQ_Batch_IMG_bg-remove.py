@@ -5,7 +5,20 @@ import numpy as np
 import io
 import concurrent.futures
 import time
+import queue
+import itertools
 import cv2
+from bg_session import get_session, process_pool, plan_workers, THREADS_PER_WORKER, MODEL_NAME  # Warm model sessions per worker
+from bg_batch import load_image, predict_masks, cutout, stream_batches, collect_batch, BATCH_SIZE  # Several images per forward pass
+from bg_lowres import load_preview, full_res_cutout, PREVIEW_SIDE, GUIDE_RADIUS, GUIDE_EPS  # Masks of huge images computed at reduced size
+from result_cache import ResultCache  # Skips inputs whose result is already in output_dir
+from bg_watch import FolderWatcher  # Watch mode: new uploads are processed as they arrive
+from bg_encode import save_image, output_extension, OUTPUT_FORMAT, PNG_LEVEL, QUANTIZE_COLORS, WEBP_QUALITY, WEBP_METHOD  # PNG level / quantized PNG / WebP / OpenCV encoders
+from file_discovery import iter_files, IMAGE_EXTENSIONS  # Lazy recursive scan of input_dir
+from bg_pipeline import run_pipeline, MEMORY_BUDGET  # Staged, memory-bounded processing
+
+# Set a threshold for white areas to be transparent (adjust as necessary)
+WHITE_THRESHOLD = 500  # Tuning this value helps control the threshold for whites
 
 def post_process_image(image):
     """
@@ -16,11 +29,8 @@ def post_process_image(image):
     image = image.convert("RGBA")
     image_data = np.array(image)
 
-    # Set a threshold for white areas to be transparent (adjust as necessary)
-    white_threshold = 500  # Tuning this value helps control the threshold for whites
-
     # Find pixels that are close to pure white (adjust the range as necessary)
-    white_areas = np.all(image_data[:, :, :3] > white_threshold, axis=-1)
+    white_areas = np.all(image_data[:, :, :3] > WHITE_THRESHOLD, axis=-1)
 
     # Apply the threshold to make those pixels transparent (set alpha channel to 0)
     image_data[white_areas] = (255, 255, 255, 0)
@@ -29,14 +39,14 @@ def post_process_image(image):
     image = Image.fromarray(image_data, "RGBA")
     return image
 
-def remove_background(input_path, output_path):
+def remove_background(input_path, output_path, output_format=OUTPUT_FORMAT):
     try:
         # Open the image file and remove the background using rembg
         with open(input_path, 'rb') as input_file:
             input_image = input_file.read()
 
-        # Process the image to remove the background
-        output_image = remove(input_image)
+        # Process the image to remove the background with this process's model session
+        output_image = remove(input_image, session=get_session())
 
         # Convert the output image to a PIL Image for post-processing
         img = Image.open(io.BytesIO(output_image))
@@ -45,16 +55,60 @@ def remove_background(input_path, output_path):
         img = post_process_image(img)
 
         # Save the output image with background removed
-        img.save(output_path, "PNG")
+        save_image(img, output_path, output_format)
 
         print(f"Background removed successfully for {input_path}. Saved to: {output_path}")
+        return True
 
     except Exception as e:
         print(f"Error processing {input_path}: {e}")
+        return False
+
+def remove_background_batch(tasks, preview_side=PREVIEW_SIDE, output_format=OUTPUT_FORMAT):
+    """
+    Remove the background of several (input_path, output_path) pairs with a single
+    model run. Decoding, compositing and saving still happen image by image.
+    Returns the pairs that were saved.
+    With preview_side set, masks are computed on images decoded at most that large and
+    scaled up edge-aware onto the full-resolution image, which is only decoded to be saved.
+    """
+    # Step 1: Decode every image of the batch, skipping the ones that fail
+    loaded = []
+    for input_path, output_path in tasks:
+        try:
+            img = load_preview(input_path, preview_side) if preview_side else load_image(input_path)
+            loaded.append((input_path, output_path, img))
+        except Exception as e:
+            print(f"Error processing {input_path}: {e}")
+    if not loaded:
+        return []
+
+    # Step 2: One forward pass for the whole batch
+    try:
+        masks = predict_masks(get_session(), [img for _, _, img in loaded])
+    except Exception as e:
+        print(f"Batch inference failed ({e}), processing images one by one.")
+        return [(input_path, output_path) for input_path, output_path, _ in loaded
+                if remove_background(input_path, output_path, output_format)]
+
+    # Step 3: Cut out, post-process and save each image
+    saved = []
+    for (input_path, output_path, img), mask in zip(loaded, masks):
+        try:
+            img = full_res_cutout(input_path, img, mask) if preview_side else cutout(img, mask)
+            img = post_process_image(img)
+            save_image(img, output_path, output_format)
+            print(f"Background removed successfully for {input_path}. Saved to: {output_path}")
+            saved.append((input_path, output_path))
+        except Exception as e:
+            print(f"Error processing {input_path}: {e}")
+    return saved
 
-def generate_output_path(input_path, output_dir):
+def generate_output_path(input_path, output_dir, extension=None, subfolder=""):
     """
     Generate an output file path with a timestamp to ensure uniqueness and adjusted name.
+    extension replaces the input's extension (e.g. ".webp" for WebP results), and
+    subfolder mirrors where the input sits below input_dir.
     """
     # Extract the filename (without extension) and the extension
     base_name = os.path.basename(input_path)
@@ -62,42 +116,227 @@ def generate_output_path(input_path, output_dir):
 
     # Add a timestamp to make the output file name unique
     timestamp = time.strftime("%Y%m%d_%H%M%S")
-    adjusted_file_name = f"{file_name} NoBg{file_extension}"
+    adjusted_file_name = f"{file_name} NoBg{extension or file_extension}"
 
     # Join the output directory and the adjusted file name
-    output_path = os.path.join(output_dir, adjusted_file_name)
+    output_path = os.path.join(output_dir, subfolder, adjusted_file_name)
 
     return output_path
 
-def process_images_in_parallel(input_dir, output_dir):
-    # Get a list of all image files in the input directory
-    image_files = [f for f in os.listdir(input_dir) if f.endswith(('.png', '.jpg', '.jpeg'))]
-    
+def open_result_cache(output_dir, batched, preview_side, output_format):
+    # Everything that changes the output is part of the cache key: the model, which
+    # inference path made the mask (rembg.remove or the batched one), its preview size
+    # and upsampling, the white threshold and the encoder with its settings
+    params = {
+        "white_threshold": WHITE_THRESHOLD,
+        "batched": bool(batched),
+        "preview_side": preview_side,
+        "guide": [GUIDE_RADIUS, GUIDE_EPS] if preview_side else None,
+        "format": output_format,
+        "encoder": {"png_level": PNG_LEVEL, "quantize_colors": QUANTIZE_COLORS,
+                    "webp_quality": WEBP_QUALITY, "webp_method": WEBP_METHOD},
+    }
+    return ResultCache(output_dir, MODEL_NAME, params)
+
+def plan_task(input_path, output_dir, cache, keys, output_format=OUTPUT_FORMAT, stat=None, subfolder=""):
+    """(input_path, output_path) to process, or None if the cache already has its result."""
+    # Use the generate_output_path function to adjust the output path
+    output_path = generate_output_path(input_path, output_dir, output_extension(output_format), subfolder)
+    if subfolder:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    if cache is not None:
+        try:
+            keys[input_path] = cache.key(input_path, stat)
+            if cache.reuse(keys[input_path], output_path):
+                print(f"Unchanged, skipping {input_path}. Result: {output_path}")
+                return None
+        except OSError as e:
+            print(f"Error processing {input_path}: {e}")
+            return None
+
+    return input_path, output_path
+
+def process_with_pipeline(tasks, batch_size, preview_side, output_format, memory_budget, on_done):
+    """Decode -> infer -> cut out/post-process/encode in one process, within memory_budget bytes."""
+    def decode(task):
+        return load_preview(task[0], preview_side) if preview_side else load_image(task[0])
+
+    def infer(images):
+        return predict_masks(get_session(), images)
+
+    def finish(task, img, mask):
+        input_path, output_path = task
+        img = full_res_cutout(input_path, img, mask) if preview_side else cutout(img, mask)
+        save_image(post_process_image(img), output_path, output_format)
+        print(f"Background removed successfully for {input_path}. Saved to: {output_path}")
+
+    get_session()  # Load the model before the first batch is waiting for it
+    run_pipeline(tasks, decode, infer, finish, batch_size, memory_budget, on_done=on_done)
+
+def submit_bounded(executor, fn, items, window):
+    """
+    Yield (item, result) of fn(*item) for every item, keeping at most window calls
+    submitted at a time, so items are only pulled from the iterator as workers free up.
+    """
+    pending = {}
+    for item in items:
+        pending[executor.submit(fn, *item)] = item
+        if len(pending) >= window:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+    for future in concurrent.futures.as_completed(pending):
+        yield pending[future], future.result()
+
+def process_images_in_parallel(input_dir, output_dir, mode="processes", workers=None, threads_per_worker=THREADS_PER_WORKER,
+                               batch_size=BATCH_SIZE, preview_side=PREVIEW_SIDE, use_cache=True, output_format=OUTPUT_FORMAT,
+                               include=(), exclude=(), recursive=True, memory_budget=MEMORY_BUDGET):
+    """
+    Remove the background of every image in input_dir.
+    mode="processes" runs one worker process per core (by default), each loading the
+    model once and running ONNX with threads_per_worker threads; mode="threads" is the
+    original thread pool sharing one session. mode="pipeline" runs decode, inference and
+    post-processing/encoding as separate stages in this process, admitting images only while
+    their estimated memory fits in memory_budget bytes.
+    Images go through the model batch_size at a time (1 = one image per run, as before).
+    Masks are computed at no more than preview_side pixels (0 = at full resolution).
+    With use_cache, inputs whose content, model and settings match an existing output are skipped.
+    output_format picks the encoder results are saved with (see bg_encode.ENCODERS).
+    Subfolders are scanned too (unless recursive=False) and mirrored in output_dir;
+    include/exclude are globs on file/folder names or paths relative to input_dir.
+    Images are found and handed to the workers as the tree is read, not listed up front.
+    """
+    # Create output directory if it doesn't exist
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    # Never pick up our own results when output_dir sits inside input_dir
+    output_inside = os.path.relpath(output_dir, input_dir)
+    if not output_inside.startswith(".."):
+        exclude = tuple(exclude) + (output_inside.replace(os.sep, "/"),)
+
+    batched = mode == "pipeline" or batch_size > 1 or preview_side
+    cache = open_result_cache(output_dir, batched, preview_side, output_format) if use_cache else None
+
+    # Prepare arguments for each image, lazily, as the folders are scanned
+    keys = {}
+
+    def planned_tasks():
+        for entry in iter_files(input_dir, IMAGE_EXTENSIONS, include, exclude, recursive):
+            subfolder = os.path.relpath(os.path.dirname(entry.path), input_dir)
+            try:
+                stat = entry.stat()  # Cached by the directory entry
+            except OSError:
+                stat = None
+            task = plan_task(entry.path, output_dir, cache, keys, output_format, stat, "" if subfolder == "." else subfolder)
+            if task is not None:
+                yield task
+
+    tasks = planned_tasks()
+    first = next(tasks, None)
+    if first is None:
+        if cache is not None:
+            cache.save()
+        print("Every image is up to date.")
+        return
+    tasks = itertools.chain([first], tasks)
+
+    def finished(saved):
+        """Record results as they come in, so an interrupted run keeps its progress."""
+        if cache is not None:
+            for input_path, output_path in saved:
+                cache.record(keys[input_path], output_path)
+
+    if mode == "pipeline":
+        process_with_pipeline(tasks, batch_size, preview_side, output_format, memory_budget, lambda task: finished([task]))
+        if cache is not None:
+            cache.save()
+        return
+
+    if mode == "processes":
+        pool_size = plan_workers(workers, threads_per_worker)[0]
+        executor = process_pool(workers, threads_per_worker)  # Decode, post-processing and encoding outside the GIL
+    else:
+        pool_size = workers or os.cpu_count() or 1
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)  # Threads sharing one session
+
+    with executor:
+        window = pool_size * 2  # Keep every worker busy without queueing the whole tree
+        if batched:
+            # Smaller batches when there are few images, so every worker gets some
+            batches = ((batch, preview_side, output_format) for batch in stream_batches(tasks, batch_size, pool_size))
+            for _, saved in submit_bounded(executor, remove_background_batch, batches, window):
+                finished(saved)
+        else:
+            for task, ok in submit_bounded(executor, remove_background, (task + (output_format,) for task in tasks), window):
+                if ok:
+                    finished([task[:2]])
+
+    if cache is not None:
+        cache.save()
+
+def watch_and_process(input_dir, output_dir, batch_size=BATCH_SIZE, preview_side=PREVIEW_SIDE, use_cache=True,
+                      output_format=OUTPUT_FORMAT):
+    """
+    Keep running and remove the background of every image that is added to or changed in
+    input_dir, once it has been completely written. The model stays loaded between uploads,
+    and images arriving close together share a model run.
+    """
     # Create output directory if it doesn't exist
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    # Prepare arguments for each image
-    tasks = []
-    for image_file in image_files:
-        input_path = os.path.join(input_dir, image_file)
-        
-        # Use the generate_output_path function to adjust the output path
-        output_path = generate_output_path(input_path, output_dir)
-        
-        tasks.append((input_path, output_path))
-
-    # Use ThreadPoolExecutor to process images in parallel
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        # Use map to apply remove_background function to each task
-        executor.map(lambda task: remove_background(*task), tasks)
+    cache = open_result_cache(output_dir, True, preview_side, output_format) if use_cache else None  # Always batched
+    get_session()  # Load the model now rather than on the first upload
+
+    ready = queue.Queue()
+    watcher = FolderWatcher(input_dir, ready, ignore=(output_dir,))
+    watcher.start()
+    print(f"Watching {input_dir} for new images (Ctrl+C to stop).")
+
+    try:
+        while True:
+            # Waits for the first image, then up to BATCH_WAIT for more to share its run
+            paths = dict.fromkeys(collect_batch(ready, batch_size))
+            keys = {}
+            tasks = [task for task in (plan_task(path, output_dir, cache, keys, output_format) for path in paths) if task]
+            if not tasks:
+                continue
+
+            for input_path, output_path in remove_background_batch(tasks, preview_side, output_format):
+                if cache is not None:
+                    cache.record(keys[input_path], output_path)
+            if cache is not None:
+                cache.save()
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    finally:
+        watcher.stop()
 
 def main():
     input_dir = " "  # Folder where input images are stored
     output_dir = " "  # Folder to store images with background removed
+    mode = "processes"  # "processes" (scales with cores), "pipeline" (bounded memory) or "threads"
+    workers = None  # Worker count, None = one per core / threads_per_worker
+    threads_per_worker = THREADS_PER_WORKER  # ONNX intra-op threads in each worker
+    batch_size = BATCH_SIZE  # Images per model run, 1 disables batching
+    preview_side = PREVIEW_SIDE  # Longest side masks are computed at, 0 = full resolution (try 1024 for big photos)
+    use_cache = True  # Skip images that were already processed with the same settings
+    watch = False  # Keep running and process images as they are added to input_dir
+    output_format = OUTPUT_FORMAT  # "png", "png-quantized", "cv2-png", "webp", ... (run benchmark_encoders.py to compare)
+    include = ()  # Globs an image must match to be processed, e.g. ("*.jpg",) or ("2024/*",)
+    exclude = ()  # Globs of files/folders to skip, e.g. ("thumbs", "*_small.*")
+    recursive = True  # Also process images in subfolders of input_dir
+    memory_budget = MEMORY_BUDGET  # Bytes of images in flight in "pipeline" mode
     
+    if watch:
+        watch_and_process(input_dir, output_dir, batch_size, preview_side, use_cache, output_format)
+        return
+
     # Process images in parallel
-    process_images_in_parallel(input_dir, output_dir)
+    process_images_in_parallel(input_dir, output_dir, mode, workers, threads_per_worker, batch_size, preview_side, use_cache,
+                               output_format, include, exclude, recursive, memory_budget)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,116 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+# Index of finished results, kept in the output folder between runs
+CACHE_FILE = ".nobg_cache.json"
+
+READ_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while True:
+            chunk = file.read(READ_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def result_key(digest, model_name, params):
+    """Key of one result: same input bytes + same model + same post-processing = same output."""
+    settings = json.dumps([digest, model_name, params], sort_keys=True)
+    return hashlib.sha256(settings.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Remembers which output was produced from which input content and settings, so reruns
+    skip unchanged inputs. Inputs are only re-hashed when their size or mtime changed, and
+    an output is only reused while it still has the size and mtime it was recorded with.
+    """
+
+    def __init__(self, output_dir, model_name, params):
+        self.output_dir = output_dir
+        self.model_name = model_name
+        self.params = params
+        self.path = os.path.join(output_dir, CACHE_FILE)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError):
+            data = {}
+        self._inputs = data.get("inputs", {})    # input path -> [size, mtime_ns, digest]
+        self._results = data.get("results", {})  # result key -> {"output", "length", "mtime_ns"}
+        self._owners = {entry["output"]: key for key, entry in self._results.items()}  # output -> result key
+        self._dirty = False
+
+    def key(self, input_path, stat=None):
+        """Result key of input_path with this cache's model and params (stat: its os.stat, if known)."""
+        stat = stat or os.stat(input_path)
+        path = os.path.abspath(input_path)
+        with self._lock:
+            known = self._inputs.get(path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            digest = known[2]
+        else:
+            digest = file_digest(input_path)
+            with self._lock:
+                self._inputs[path] = [stat.st_size, stat.st_mtime_ns, digest]
+                self._dirty = True
+        return result_key(digest, self.model_name, self.params)
+
+    def reuse(self, key, output_path):
+        """
+        True if the result for key is already at output_path, or was copied there from
+        another output with the same key (e.g. a renamed or duplicated input).
+        """
+        with self._lock:
+            entry = self._results.get(key)
+        if not entry:
+            return False
+
+        source = os.path.join(self.output_dir, entry["output"])
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return False
+        if stat.st_size != entry["length"] or stat.st_mtime_ns != entry["mtime_ns"]:
+            return False  # Edited or replaced since it was recorded
+
+        if os.path.abspath(source) != os.path.abspath(output_path):
+            shutil.copy2(source, output_path)
+            self.record(key, output_path)
+        return True
+
+    def record(self, key, output_path):
+        """Remember that output_path now holds the result for key."""
+        stat = os.stat(output_path)
+        output = os.path.relpath(output_path, self.output_dir)
+        with self._lock:
+            # An output that was overwritten no longer holds the result of its old key
+            old_key = self._owners.get(output)
+            if old_key is not None and old_key != key:
+                self._results.pop(old_key, None)
+            old_entry = self._results.get(key)
+            if old_entry is not None and old_entry["output"] != output:
+                self._owners.pop(old_entry["output"], None)
+            self._results[key] = {"output": output, "length": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            self._owners[output] = key
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as cache_file:
+                json.dump({"inputs": self._inputs, "results": self._results}, cache_file)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,79 @@
+import pytest
+import numpy as np
+from PIL import Image
+from rembg import remove
+from rembg.sessions.u2net import U2netSession
+
+from bg_batch import load_image, predict_masks, cutout
+
+
+class _Input:
+    name = "input.1"
+    shape = ["batch", 3, 320, 320]
+
+
+class _InnerSession:
+    """Stands in for the ONNX model: the "mask" is a fixed function of the input."""
+
+    def get_inputs(self):
+        return [_Input()]
+
+    def run(self, outputs, feed):
+        batch = feed[_Input.name]
+        return [batch.mean(axis=1, keepdims=True)]
+
+
+def fake_u2net_session():
+    session = U2netSession.__new__(U2netSession)  # rembg's own predict(), without loading a model
+    session.model_name = "u2net"
+    session.inner_session = _InnerSession()
+    return session
+
+
+def rgba_image(path):
+    height, width = 90, 120
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.zeros((height, width, 4), dtype=np.uint8)
+    pixels[..., 0] = x * 2
+    pixels[..., 1] = y * 2
+    pixels[..., 2] = 128
+    pixels[..., 3] = np.where(x < 60, 255, 40)  # Half opaque, half mostly transparent
+    Image.fromarray(pixels, "RGBA").save(path)
+
+
+def test_batched_cutout_keeps_input_alpha_like_rembg(tmp_path):
+    path = str(tmp_path / "input.png")
+    rgba_image(path)
+    session = fake_u2net_session()
+
+    expected = np.asarray(remove(Image.open(path), session=session)).astype(int)
+
+    img = load_image(path)
+    assert img.mode == "RGBA"
+    result = np.asarray(cutout(img, predict_masks(session, [img])[0])).astype(int)
+
+    assert result.shape == expected.shape
+    assert np.abs(result[..., 3] - expected[..., 3]).max() <= 2
+    assert np.abs(result - expected).max() <= 2
+
+
+def test_batch_matches_one_image_at_a_time(tmp_path):
+    session = fake_u2net_session()
+    images = []
+    for index, size in enumerate([(120, 90), (64, 200), (300, 150)]):
+        path = str(tmp_path / f"{index}.png")
+        Image.new("RGB", size, (index * 80, 40, 200)).save(path)
+        images.append(load_image(path))
+
+    batched = predict_masks(session, images)
+    single = [predict_masks(session, [img])[0] for img in images]
+    for a, b in zip(batched, single):
+        assert a.size == b.size
+        assert np.array_equal(np.asarray(a), np.asarray(b))
+
+
+def test_models_outside_the_u2net_family_are_refused():
+    session = fake_u2net_session()
+    session.model_name = "birefnet-general"
+    with pytest.raises(ValueError):
+        predict_masks(session, [Image.new("RGB", (32, 32))])
@@ -0,0 +1,57 @@
+import threading
+
+from PIL import Image
+
+from bg_pipeline import run_pipeline
+
+
+def make_tasks(tmp_path, count):
+    tasks = []
+    for index in range(count):
+        path = str(tmp_path / f"{index}.png")
+        Image.new("RGB", (16, 16)).save(path)
+        tasks.append((path, str(tmp_path / f"{index} NoBg.png")))
+    return tasks
+
+
+def run_with_timeout(**kwargs):
+    thread = threading.Thread(target=run_pipeline, kwargs=kwargs, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+    assert not thread.is_alive(), "run_pipeline stalled"
+
+
+def test_every_task_is_finished_and_reported(tmp_path):
+    tasks = make_tasks(tmp_path, 12)
+    done = []
+    run_with_timeout(tasks=tasks, decode=lambda task: task[0], infer=lambda items: items,
+                     finish=lambda task, item, result: None, batch_size=4, on_done=done.append)
+    assert sorted(done) == sorted(tasks)
+
+
+def test_failing_on_done_does_not_stall_the_pipeline(tmp_path, capsys):
+    tasks = make_tasks(tmp_path, 12)
+    finished = []
+
+    def on_done(task):
+        raise RuntimeError("cannot record")
+
+    # A tiny budget admits one image at a time, so a lost release would deadlock admission
+    run_with_timeout(tasks=tasks, decode=lambda task: task[0], infer=lambda items: items,
+                     finish=lambda task, item, result: finished.append(task), batch_size=1,
+                     memory_budget=1, finish_threads=1, on_done=on_done)
+    assert sorted(finished) == sorted(tasks)
+    assert capsys.readouterr().out.count("cannot record") == len(tasks)
+
+
+def test_failing_finish_releases_its_memory(tmp_path):
+    tasks = make_tasks(tmp_path, 6)
+    done = []
+
+    def finish(task, item, result):
+        if task is tasks[0]:
+            raise ValueError("bad image")
+
+    run_with_timeout(tasks=tasks, decode=lambda task: task[0], infer=lambda items: items,
+                     finish=finish, batch_size=1, memory_budget=1, on_done=done.append)
+    assert sorted(done) == sorted(tasks[1:])
@@ -0,0 +1,58 @@
+import os
+import queue
+
+import bg_watch
+from bg_watch import FolderWatcher
+
+
+class _OneRound:
+    """Stands in for the stop event: lets _settle run exactly one polling round."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def wait(self, timeout):
+        self.calls += 1
+        return self.calls > 1
+
+
+def settle_once(watcher):
+    watcher._stopped = _OneRound()
+    watcher._settle()
+
+
+def make_watcher(tmp_path, ready):
+    path = str(tmp_path / "upload.jpg")
+    with open(path, "wb") as file:
+        file.write(b"partial")
+    watcher = FolderWatcher(str(tmp_path), ready, debounce=0)
+    watcher.touch(path)
+    return watcher, os.path.abspath(path)
+
+
+def test_quiet_file_is_handed_over_once_its_stat_is_stable(tmp_path):
+    ready = queue.Queue()
+    watcher, path = make_watcher(tmp_path, ready)
+    settle_once(watcher)  # First round only records size/mtime
+    assert ready.empty()
+    settle_once(watcher)
+    assert ready.get_nowait() == path
+
+
+def test_event_during_the_stat_keeps_the_file_pending(tmp_path, monkeypatch):
+    ready = queue.Queue()
+    watcher, path = make_watcher(tmp_path, ready)
+    settle_once(watcher)
+
+    real_stat = os.stat
+
+    def stat_while_writing(target, *args, **kwargs):
+        result = real_stat(target, *args, **kwargs)
+        if target == path:
+            watcher.touch(target)  # The uploader writes again right after our stat
+        return result
+
+    monkeypatch.setattr(bg_watch.os, "stat", stat_while_writing)
+    settle_once(watcher)
+    assert ready.empty()
+    assert path in watcher._pending
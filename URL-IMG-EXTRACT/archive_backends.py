@@ -0,0 +1,56 @@
+import os
+from zipfile import ZipFile, ZIP_STORED, ZIP_DEFLATED
+
+from parallel_zip import zip_files, worth_compressing, SNIFF_SIZE
+from tar_zst import TarZstWriter, tar_zst_files
+
+# Output format of the zipper scripts: "zip" or "tar.zst"
+ARCHIVE_FORMAT = "zip"
+
+
+class ZipStreamWriter:
+    """ZIP counterpart of TarZstWriter for members that arrive as bytes (one writer thread)."""
+
+    def __init__(self, archive_name):
+        self.zipf = ZipFile(archive_name, "w")
+
+    def add_bytes(self, arcname, data):
+        # Images are stored as is, only content that actually shrinks is deflated
+        method = ZIP_DEFLATED if worth_compressing(data[:SNIFF_SIZE]) else ZIP_STORED
+        self.zipf.writestr(arcname, data, compress_type=method)
+
+    def close(self):
+        self.zipf.close()
+
+    def abort(self):
+        self.zipf.close()
+        os.remove(self.zipf.filename)
+
+
+# Format -> (file extension, write every file at once, open a writer fed with bytes)
+ARCHIVE_BACKENDS = {
+    "zip": (".zip", zip_files, ZipStreamWriter),
+    "tar.zst": (".tar.zst", tar_zst_files, TarZstWriter),
+}
+
+
+def _backend(archive_format):
+    try:
+        return ARCHIVE_BACKENDS[archive_format]
+    except KeyError:
+        raise ValueError(f"Unknown archive format: {archive_format} (choose from {', '.join(ARCHIVE_BACKENDS)})")
+
+
+def archive_name(base_name, archive_format=ARCHIVE_FORMAT):
+    """e.g. archive_name("images", "tar.zst") -> "images.tar.zst"."""
+    return base_name + _backend(archive_format)[0]
+
+
+def write_archive(files, archive_file_name, archive_format=ARCHIVE_FORMAT, arcname=os.path.basename):
+    """Archive files into archive_file_name with the chosen backend."""
+    _backend(archive_format)[1](files, archive_file_name, arcname)
+
+
+def open_archive(archive_file_name, archive_format=ARCHIVE_FORMAT):
+    """Writer with add_bytes(arcname, data), close() and abort(), for members built in memory."""
+    return _backend(archive_format)[2](archive_file_name)
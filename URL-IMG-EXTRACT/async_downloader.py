@@ -0,0 +1,150 @@
+import os
+import asyncio
+
+import aiohttp
+from tqdm import tqdm  # Import tqdm for the progress bar
+
+import partial_download
+import content_store
+from http_cache import get_cache
+from http_session import DEFAULT_HEADERS
+
+# Maximum number of transfers kept in flight at once
+MAX_IN_FLIGHT = 200
+
+# Read the body in 64k chunks instead of 1k to cut per-chunk overhead
+CHUNK_SIZE = 64 * 1024
+
+# Body bytes gathered before they are written to disk on a worker thread,
+# so file writes never block the event loop
+WRITE_SIZE = 1024 * 1024
+
+
+async def _write_body(response, out_file):
+    """Copy the response body into out_file, writing WRITE_SIZE blocks off the event loop."""
+    buffer = bytearray()
+    try:
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            buffer += chunk
+            if len(buffer) >= WRITE_SIZE:
+                await asyncio.to_thread(out_file.write, bytes(buffer))
+                buffer.clear()
+    finally:
+        if buffer:
+            # Also on errors: what did arrive is kept in the .part file for resuming
+            await asyncio.to_thread(out_file.write, bytes(buffer))
+
+
+def _finish(file_path, url, digest, headers, download_folder, dedup, cache):
+    """Blocking end of a download (rename, dedup, cache index), run on a worker thread."""
+    if not partial_download.is_complete(file_path):
+        tqdm.write(f"Download of {url} was cut short, it will resume on the next run.")
+        return False
+
+    partial_download.finish(file_path)
+    if dedup and content_store.store(file_path, digest, url, dedup):
+        tqdm.write(f"Saved {os.path.basename(file_path)} to {download_folder} (same content as an earlier file, stored once).")
+    else:
+        tqdm.write(f"Saved {os.path.basename(file_path)} to {download_folder}.")
+    cache.remember(url, file_path, headers)
+    return True
+
+
+async def _download_one(session, semaphore, url, download_folder, content_kind, name_for_url, pbar, large_file_handler, large_file_threshold, dedup):
+    """Download a single URL through a resumable .part file, returning True on success."""
+    async with semaphore:
+        try:
+            # No await between reserving the name and claiming it with a sidecar,
+            # so concurrent tasks can never pick the same path. A copy saved by an
+            # earlier run keeps its name and is revalidated with a conditional request
+            cache = get_cache()
+            cached_path = cache.cached_path(url, download_folder)
+            file_path = cached_path or partial_download.reserve_path(download_folder, name_for_url(url), url)
+            offset, resume_headers = partial_download.resume_request(file_path)
+            if cached_path and not offset:
+                resume_headers = cache.conditional_headers(url)
+
+            async with session.get(url, headers=resume_headers) as response:
+                response.raise_for_status()
+
+                if response.status == 304:
+                    tqdm.write(f"{os.path.basename(file_path)} is unchanged since the last run, keeping it.")
+                    return True
+
+                # Check if the response content type is the expected kind of media
+                content_type = response.headers.get("Content-Type", "")
+                if content_kind and content_kind not in content_type:
+                    tqdm.write(f"Skipping {url} (not {content_kind} content).")
+                    partial_download.discard(file_path)
+                    return False
+
+                offset, total_size = partial_download.record_response(
+                    file_path, url, response.status, response.headers, offset
+                )
+                hand_off = (
+                    large_file_handler is not None and offset == 0
+                    and (total_size or 0) >= large_file_threshold
+                )
+
+                if hand_off:
+                    response.close()  # Drop the unread body, the handler opens its own connections
+                else:
+                    open_part = content_store.open_part if dedup else partial_download.open_part
+                    with open_part(file_path, offset) as out_file:
+                        await _write_body(response, out_file)
+
+            if hand_off:
+                # Large files go to a blocking handler (e.g. a segmented Range download) on a worker thread
+                return await asyncio.to_thread(large_file_handler, url)
+
+            digest = out_file.hexdigest() if dedup else None
+            return await asyncio.to_thread(
+                _finish, file_path, url, digest, response.headers, download_folder, dedup, cache
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError) as e:
+            tqdm.write(f"Error downloading {url}: {e}")
+            return False
+        finally:
+            pbar.update(1)
+
+
+async def _download_all(urls, download_folder, content_kind, name_for_url, max_in_flight, large_file_handler, large_file_threshold, dedup):
+    semaphore = asyncio.Semaphore(max_in_flight)
+    connector = aiohttp.TCPConnector(limit=max_in_flight, limit_per_host=0, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=60)
+
+    async with aiohttp.ClientSession(headers=DEFAULT_HEADERS, connector=connector, timeout=timeout) as session:
+        with tqdm(total=len(urls), unit="file", desc="Downloading") as pbar:
+            tasks = [
+                _download_one(
+                    session, semaphore, url, download_folder, content_kind, name_for_url, pbar,
+                    large_file_handler, large_file_threshold, dedup,
+                )
+                for url in urls
+            ]
+            # One unexpected failure must not cancel the other downloads
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    for url, result in zip(urls, results):
+        if isinstance(result, BaseException):
+            print(f"Error downloading {url}: {result}")
+    return sum(1 for success in results if success is True)
+
+
+def download_all(urls, download_folder, content_kind, name_for_url, max_in_flight=MAX_IN_FLIGHT,
+                 large_file_handler=None, large_file_threshold=0, dedup=None):
+    """
+    Download every URL into download_folder on a single asyncio event loop.
+    content_kind is the Content-Type substring a response must contain ("image", "video").
+    name_for_url maps a URL to its file name. Responses of at least large_file_threshold
+    bytes are passed to large_file_handler(url) instead, which returns True on success.
+    dedup="hardlink" or "manifest" hashes each body while it is written and stores
+    identical contents once (see content_store). Returns the number of successful downloads.
+    """
+    if not os.path.exists(download_folder):
+        os.makedirs(download_folder)
+
+    return asyncio.run(_download_all(
+        list(urls), download_folder, content_kind, name_for_url, max_in_flight,
+        large_file_handler, large_file_threshold, dedup,
+    ))
@@ -1,17 +1,91 @@
 import os
-import requests
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http_session import get_session, ensure_host_pool_size  # Shared keep-alive connection pool
 from bs4 import BeautifulSoup
-from zipfile import ZipFile
+from archive_backends import write_archive, open_archive, archive_name, ARCHIVE_FORMAT  # ZIP or tar.zst output
 from tqdm import tqdm  # Import tqdm for progress bar
 
-def process_images():
+# Number of images downloaded at the same time in streaming mode
+DOWNLOAD_WORKERS = 8
+
+def fetch_image(img_url):
+    """Download one image into memory, or return None if it failed."""
+    try:
+        response = get_session().get(img_url, timeout=30)
+        if response.status_code == 200:
+            return response.content
+        print(f"Failed to download: {img_url}")
+    except Exception as e:
+        print(f"Error downloading {img_url}: {e}")
+    return None
+
+def stream_images_to_zip(img_urls, zip_file_name, workers=DOWNLOAD_WORKERS, archive_format=ARCHIVE_FORMAT):
+    """
+    Download img_urls concurrently and write each body straight into zip_file_name,
+    without intermediate files. One writer thread owns the archive and is fed through
+    a bounded queue, so at most about 2 * workers bodies are held in memory.
+    Returns the number of images archived.
+    """
+    archive_queue = queue.Queue(maxsize=workers * 2)
+    writer_errors = []
+    archived = []
+
+    def write_members():
+        try:
+            archive = open_archive(zip_file_name, archive_format)
+        except Exception as e:
+            archive = None
+            writer_errors.append(e)
+        while True:
+            item = archive_queue.get()
+            if item is None:
+                break
+            if writer_errors:
+                continue  # Keep draining so no download blocks on a dead writer
+            try:
+                archive.add_bytes(*item)
+                archived.append(item[0])
+            except Exception as e:
+                writer_errors.append(e)
+        if archive is not None:
+            archive.close()
+
+    def download(idx, img_url):
+        data = fetch_image(img_url)
+        if data is not None:
+            archive_queue.put((f"image_{idx + 1}.jpg", data))  # Blocks while the writer is behind
+        pbar.update(1)
+
+    if img_urls:
+        ensure_host_pool_size(img_urls[0], workers)  # One keep-alive connection per worker
+
+    writer = threading.Thread(target=write_members)
+    writer.start()
+    try:
+        with tqdm(total=len(img_urls), desc="Downloading") as pbar, ThreadPoolExecutor(max_workers=workers) as executor:
+            for idx, img_url in enumerate(img_urls):
+                executor.submit(download, idx, img_url)
+    finally:
+        archive_queue.put(None)
+        writer.join()
+
+    if writer_errors:
+        raise writer_errors[0]
+    return len(archived)
+
+def process_images(stream_to_zip=False, workers=DOWNLOAD_WORKERS, archive_format=ARCHIVE_FORMAT):
+    """
+    Download every image of combined_images.html and archive it into images.zip
+    (or images.tar.zst with archive_format="tar.zst").
+    stream_to_zip=True downloads with `workers` threads straight into the archive;
+    no files are written to downloaded_images, so the corrupt/delete steps are skipped.
+    """
     # Step 1: Parse combined_images.html
     html_file = "combined_images.html"
     download_folder = "downloaded_images"
-    zip_file_name = "images.zip"
-
-    if not os.path.exists(download_folder):
-        os.makedirs(download_folder)
+    zip_file_name = archive_name("images", archive_format)  # .zip or .tar.zst
 
     # Read the HTML file
     with open(html_file, "r") as file:
@@ -23,12 +97,21 @@ def process_images():
 
     print(f"Found {len(img_urls)} images.")
 
+    if stream_to_zip:
+        print("Downloading images into the archive...")
+        archived_count = stream_images_to_zip(img_urls, zip_file_name, workers, archive_format)
+        print(f"Images zipped into {zip_file_name} ({archived_count}/{len(img_urls)} downloaded)")
+        return
+
+    if not os.path.exists(download_folder):
+        os.makedirs(download_folder)
+
     # Step 2: Download the images with a progress bar
     downloaded_files = []
     print("Downloading images...")
     for idx, img_url in enumerate(tqdm(img_urls, desc="Downloading")):  # Add progress bar
         try:
-            response = requests.get(img_url, stream=True)
+            response = get_session().get(img_url, stream=True)
             if response.status_code == 200:
                 file_path = os.path.join(download_folder, f"image_{idx + 1}.jpg")
                 with open(file_path, "wb") as img_file:
@@ -44,9 +127,7 @@ def process_images():
 
     # Step 3: Zip the images
     print("Zipping images...")
-    with ZipFile(zip_file_name, "w") as zipf:
-        for file in downloaded_files:
-            zipf.write(file, os.path.basename(file))
+    write_archive(downloaded_files, zip_file_name, archive_format)  # Members are compressed on every core
     print(f"Images zipped into {zip_file_name}")
 
     # Step 4: Corrupt the images by reducing them to 0 bytes
@@ -68,4 +149,9 @@ def process_images():
         print("Corrupted images retained.")
 
 if __name__ == "__main__":
-    process_images()
+    # Customizable parameters
+    stream_to_zip = False  # Download concurrently straight into images.zip (no downloaded_images folder)
+    download_workers = DOWNLOAD_WORKERS  # Parallel downloads when streaming
+    archive_format = ARCHIVE_FORMAT  # "zip" or "tar.zst" (faster, needs the zstandard package)
+
+    process_images(stream_to_zip, download_workers, archive_format)
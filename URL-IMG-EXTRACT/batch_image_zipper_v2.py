@@ -1,18 +1,18 @@
 import os
-import requests
+from http_session import get_session  # Shared keep-alive connection pool
 from bs4 import BeautifulSoup
-from zipfile import ZipFile
+from archive_backends import write_archive, archive_name, ARCHIVE_FORMAT  # ZIP or tar.zst output
 from tqdm import tqdm  # Import tqdm for progress bar
 
 import subprocess
 import sys
 
 
-def process_images():
+def process_images(archive_format=ARCHIVE_FORMAT):
     # Step 1: Parse combined_images.html
     html_file = "combined_images.html"
     download_folder = "downloaded_images"
-    zip_file_name = "images.zip"
+    zip_file_name = archive_name("images", archive_format)  # .zip or .tar.zst
 
     if not os.path.exists(download_folder):
         os.makedirs(download_folder)
@@ -37,7 +37,7 @@ def process_images():
 
     for idx, img_url in enumerate(tqdm(img_urls, desc="Downloading", unit="image")):
         try:
-            response = requests.get(img_url, stream=True)
+            response = get_session().get(img_url, stream=True)
             if response.status_code == 200:
                 if maintain_names:
                     file_name = os.path.basename(img_url.split("?")[0])  # Original name
@@ -62,9 +62,7 @@ def process_images():
 
     # Step 3: Zip the images
     print("Zipping images...")
-    with ZipFile(zip_file_name, "w") as zipf:
-        for file in downloaded_files:
-            zipf.write(file, os.path.basename(file))
+    write_archive(downloaded_files, zip_file_name, archive_format)  # Members are compressed on every core
     print(f"Images zipped into {zip_file_name}")
 
     # Step 4: Confirm before corrupting
@@ -100,7 +98,8 @@ def process_images():
 
 
 if __name__ == "__main__":
-    process_images()
+    archive_format = ARCHIVE_FORMAT  # "zip" or "tar.zst" (faster, needs the zstandard package)
+    process_images(archive_format)
 
     # ---------------------------------
     # OPTIONAL: run next script afterward
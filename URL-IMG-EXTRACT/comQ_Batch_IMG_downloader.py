@@ -1,21 +1,42 @@
 import os
+import shutil
 import requests
-from bs4 import BeautifulSoup
+from http_session import get_session  # Shared keep-alive connection pool
+from link_parser import iter_tags  # Fast targeted <a>/<img> extraction
 from urllib.parse import urlsplit, parse_qs
 import re
 from concurrent.futures import ThreadPoolExecutor  # For parallel downloading
 from tqdm import tqdm  # Import tqdm for the progress bar
+from stream_pipeline import stream_and_download  # Download while the page is still being parsed
+from async_downloader import download_all, MAX_IN_FLIGHT  # asyncio engine for large batches
+import partial_download  # .part files + sidecars for resumable downloads
+import content_store  # Optional content-addressed storage of downloaded files
+from http_cache import get_cache  # ETag/Last-Modified index for conditional refetches
+
+# Links ending in one of these extensions are treated as image links
+IMAGE_LINK_PATTERN = re.compile(r"\.(jpg|jpeg|png|gif|bmp|webp)$", re.IGNORECASE)
 
 # Step 1: Save the webpage source as index.html
 def save_page_source(url, filename="index.html"):
     try:
-        # Fetch the webpage content
-        response = requests.get(url)
+        # Fetch the webpage content, asking only for changes if an earlier copy is recorded
+        cache = get_cache()
+        cached_path = cache.cached_path(url)
+        headers = cache.conditional_headers(url) if cached_path else {}
+        response = get_session().get(url, headers=headers)
         response.raise_for_status()
 
+        if response.status_code == 304:
+            if os.path.abspath(cached_path) != os.path.abspath(filename):
+                shutil.copyfile(cached_path, filename)
+                cache.touch(url, filename)
+            print(f"Page unchanged since the last run, reusing {filename}.")
+            return
+
         # Save the page source as index.html
         with open(filename, "w", encoding="utf-8") as file:
             file.write(response.text)
+        cache.remember(url, filename, response.headers)
         print(f"Page source saved to {filename}.")
     except requests.exceptions.RequestException as e:
         print(f"Error fetching the website: {e}")
@@ -23,29 +44,27 @@ def save_page_source(url, filename="index.html"):
 # Step 2: Extract image links from the saved HTML page
 def extract_image_links_from_html(filename="index.html", max_images=10, min_width=0, min_height=0):
     try:
-        with open(filename, "r", encoding="utf-8") as file:
-            soup = BeautifulSoup(file, "html.parser")
-        
-        # Find all anchor tags that contain image links
-        a_tags = soup.find_all("a", href=re.compile(r"\.(jpg|jpeg|png|gif|bmp|webp)$", re.IGNORECASE))
         valid_images = []
         count = 0
 
-        for a_tag in a_tags:
-            if count >= max_images:
-                break
-            img_url = a_tag.get("href")
-            if not img_url:
-                continue
-
-            # Handle relative URLs
-            if img_url.startswith("//"):
-                img_url = f"http:{img_url}"
-            elif img_url.startswith("/"):
-                img_url = f"{url.rstrip('/')}{img_url}"
-
-            valid_images.append(img_url)
-            count += 1
+        with open(filename, "r", encoding="utf-8") as file:
+            # Find all anchor tags that contain image links. Only <a> tags are
+            # extracted, and parsing stops as soon as max_images links are found
+            for _, attrs in iter_tags(file, ("a",)):
+                if count >= max_images:
+                    break
+                img_url = attrs.get("href")
+                if not img_url or not IMAGE_LINK_PATTERN.search(img_url):
+                    continue
+
+                # Handle relative URLs
+                if img_url.startswith("//"):
+                    img_url = f"http:{img_url}"
+                elif img_url.startswith("/"):
+                    img_url = f"{url.rstrip('/')}{img_url}"
+
+                valid_images.append(img_url)
+                count += 1
 
         return valid_images
     except Exception as e:
@@ -135,53 +154,72 @@ def sanitize_filename(img_url):
     return filename
 
 # Step 5: Download image
-def download_image(img_url, download_folder="downloaded_images"):
-    """Download image from the URL and save it to the specified folder."""
+def download_image(img_url, download_folder="downloaded_images", dedup=None):
+    """Download image from the URL and save it to the specified folder.
+    Data goes to a .part file first, so an interrupted download resumes on the next run.
+    dedup="hardlink" or "manifest" stores each unique content once (see content_store).
+    """
     if not os.path.exists(download_folder):
         os.makedirs(download_folder)
 
     try:
         print(f"Downloading {img_url}...")
 
-        # Add headers to simulate a browser request
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
+        # Get the sanitized image filename, reusing an unfinished .part of the same URL,
+        # otherwise adding a number to avoid overwriting. A copy saved by an earlier run
+        # keeps its name and is only fetched again if the server reports a change
+        cache = get_cache()
+        cached_path = cache.cached_path(img_url, download_folder)
+        img_name = sanitize_filename(img_url)  # Sanitize filename to keep the desired part
+        img_path = cached_path or partial_download.reserve_path(download_folder, img_name, img_url)
+        img_name = os.path.basename(img_path)
+
+        # Only ask for the missing bytes if an earlier run was interrupted
+        offset, resume_headers = partial_download.resume_request(img_path)
+        if cached_path and not offset:
+            resume_headers = cache.conditional_headers(img_url)
 
-        img_response = requests.get(img_url, headers=headers, stream=True)
+        img_response = get_session().get(img_url, headers=resume_headers, stream=True)
         img_response.raise_for_status()
 
+        if img_response.status_code == 304:
+            img_response.close()
+            print(f"{img_name} is unchanged since the last run, keeping it.")
+            return True
+
         # Check if the response content type is an image
         content_type = img_response.headers.get('Content-Type', '')
         if 'image' not in content_type:
             print(f"Skipping {img_url} (not an image).")
+            img_response.close()  # Hand the connection back to the pool
+            partial_download.discard(img_path)
             return False  # Return False if the image isn't downloaded
 
-        # Get the sanitized image filename
-        img_name = sanitize_filename(img_url)  # Sanitize filename to keep the desired part
-        img_path = os.path.join(download_folder, img_name)
-
-        # Check if filename exists already, then add a number to avoid overwriting
-        if os.path.exists(img_path):
-            base_name, ext = os.path.splitext(img_name)
-            counter = 1
-            while os.path.exists(img_path):
-                img_name = f"{base_name}_{counter}{ext}"
-                img_path = os.path.join(download_folder, img_name)
-                counter += 1
+        offset, total_size = partial_download.record_response(
+            img_path, img_url, img_response.status_code, img_response.headers, offset
+        )
 
         # Download image with progress bar
-        with open(img_path, "wb") as img_file:
-            total_size = int(img_response.headers.get('Content-Length', 0))
+        open_part = content_store.open_part if dedup else partial_download.open_part
+        with open_part(img_path, offset) as img_file:
             chunk_size = 1024  # Download in 1k chunks
-            with tqdm(total=total_size, unit='B', unit_scale=True, desc=img_name) as pbar:
+            with tqdm(total=total_size or 0, initial=offset, unit='B', unit_scale=True, desc=img_name) as pbar:
                 for chunk in img_response.iter_content(chunk_size=chunk_size):
                     img_file.write(chunk)
                     pbar.update(len(chunk))
 
-        print(f"Saved {img_name} to {download_folder}.")
+        if not partial_download.is_complete(img_path):
+            print(f"Download of {img_url} was cut short, it will resume on the next run.")
+            return False
+
+        partial_download.finish(img_path)
+        if dedup and content_store.store(img_path, img_file.hexdigest(), img_url, dedup):
+            print(f"Saved {img_name} to {download_folder} (same content as an earlier file, stored once).")
+        else:
+            print(f"Saved {img_name} to {download_folder}.")
+        cache.remember(img_url, img_path, img_response.headers)  # Revalidate instead of refetching next time
         return True  # Return True if download was successful
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, ValueError) as e:
         print(f"Error downloading {img_url}: {e}")
         return False  # Return False if download failed
 
@@ -200,14 +238,20 @@ def ask_user_to_download_image(img_url):
         return ask_user_to_download_image(img_url)
 
 # Step 7: Download selected images concurrently
-def download_images_concurrently(selected_images, download_folder="downloaded_images"):
-    """Download multiple images concurrently with a progress bar."""
+def download_images_concurrently(selected_images, download_folder="downloaded_images", engine="asyncio", max_in_flight=MAX_IN_FLIGHT, dedup=None):
+    """Download multiple images concurrently with a progress bar.
+    engine="asyncio" keeps up to max_in_flight transfers open on one event loop,
+    engine="threads" uses the original 5-worker thread pool.
+    """
+    if engine == "asyncio":
+        return download_all(selected_images, download_folder, "image", sanitize_filename, max_in_flight, dedup=dedup)
+
     downloaded_count = 0  # Counter for successfully downloaded images
 
     # Using ThreadPoolExecutor to download images concurrently
     with ThreadPoolExecutor(max_workers=5) as executor:
         # Track successful downloads
-        for success in executor.map(lambda img_url: download_image(img_url, download_folder), selected_images):
+        for success in executor.map(lambda img_url: download_image(img_url, download_folder, dedup), selected_images):
             if success:
                 downloaded_count += 1
 
@@ -220,30 +264,44 @@ if __name__ == "__main__":
 
     # Customizable parameters
     max_images = 0  # Maximum number of images to extract
+    download_engine = "asyncio"  # "asyncio" (hundreds of transfers in flight) or "threads" (5 workers)
+    stream_mode = False  # Download every image link while the page is parsed (no prompts, max_images = 0 means no limit)
+    dedup_mode = None  # None, "hardlink" or "manifest": store identical files only once
     min_width = 0   # Minimum width of images (in pixels)
     min_height = 0  # Minimum height of images (in pixels)
 
-    # Step 1: Save the webpage source as index.html
-    save_page_source(website_url)
+    if stream_mode:
+        # Parse the page as it arrives and start each download as soon as its link is found
+        try:
+            downloaded_count, found_count = stream_and_download(
+                website_url, IMAGE_LINK_PATTERN, lambda img_url: download_image(img_url, dedup=dedup_mode),
+                max_images, save_as="index.html",
+            )
+            print(f"\nTotal images downloaded: ({downloaded_count}/{found_count})")
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching the website: {e}")
+    else:
+        # Step 1: Save the webpage source as index.html
+        save_page_source(website_url)
 
-    # Step 2: Extract image links from the saved index.html
-    image_links = extract_image_links_from_html("index.html", max_images, min_width, min_height)
+        # Step 2: Extract image links from the saved index.html
+        image_links = extract_image_links_from_html("index.html", max_images, min_width, min_height)
 
-    # Step 3: Save the extracted images to images.html
-    save_images_to_html(image_links)
+        # Step 3: Save the extracted images to images.html
+        save_images_to_html(image_links)
 
-    # Step 4: Ask the user for each image whether to download it
-    selected_images = []
-    for img_url in image_links:
-        result = ask_user_to_download_image(img_url)
-        if result:
-            selected_images.append(result)
+        # Step 4: Ask the user for each image whether to download it
+        selected_images = []
+        for img_url in image_links:
+            result = ask_user_to_download_image(img_url)
+            if result:
+                selected_images.append(result)
 
-    # Step 5: Download selected images concurrently with progress bar
-    if selected_images:
-        downloaded_count = download_images_concurrently(selected_images)
+        # Step 5: Download selected images concurrently with progress bar
+        if selected_images:
+            downloaded_count = download_images_concurrently(selected_images, engine=download_engine, dedup=dedup_mode)
 
-        # Print the total number of images downloaded
-        print(f"\nTotal images downloaded: ({downloaded_count}/{len(selected_images)})")
+            # Print the total number of images downloaded
+            print(f"\nTotal images downloaded: ({downloaded_count}/{len(selected_images)})")
 
     print("Script finished.")
@@ -1,5 +1,6 @@
 import os
 import requests
+from http_session import get_session  # Shared keep-alive connection pool
 from bs4 import BeautifulSoup
 from urllib.parse import urlsplit, parse_qs
 import re
@@ -9,7 +10,7 @@ from concurrent.futures import ThreadPoolExecutor  # For parallel downloading
 def save_page_source(url, filename="index.html"):
     try:
         # Fetch the webpage content
-        response = requests.get(url)
+        response = get_session().get(url)
         response.raise_for_status()
 
         # Save the page source as index.html
@@ -142,12 +143,7 @@ def download_image(img_url, download_folder="downloaded_images"):
     try:
         print(f"Downloading {img_url}...")
 
-        # Add headers to simulate a browser request
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-
-        img_response = requests.get(img_url, headers=headers)
+        img_response = get_session().get(img_url)
         img_response.raise_for_status()
 
         # Check if the response content type is an image
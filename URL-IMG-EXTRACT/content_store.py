@@ -0,0 +1,156 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+import partial_download
+
+# Unique file contents live once under download_folder/.blobs/<first 2 hex>/<sha256><ext>
+STORE_DIR = ".blobs"
+
+# name -> blob record for every file kept in the store
+MANIFEST_FILE = "manifest.json"
+
+# "hardlink": every readable name is a hardlink to its blob (falls back to the manifest
+# on filesystems without hardlinks); "manifest": names only exist in the manifest
+DEDUP_MODES = ("hardlink", "manifest")
+
+HASH_CHUNK = 1024 * 1024
+
+_manifest_lock = threading.Lock()
+_store_lock = threading.Lock()
+_manifest_cache = {}  # manifest path -> (size, mtime_ns, manifest), for resolve()
+
+
+class HashingFile:
+    """File wrapper that hashes everything written through it."""
+
+    def __init__(self, file, hasher):
+        self.file = file
+        self.hasher = hasher
+
+    def write(self, data):
+        self.hasher.update(data)
+        return self.file.write(data)
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+
+def _hash_file(path, hasher=None, limit=None):
+    """Feed the first limit bytes of path (all of it by default) to hasher."""
+    hasher = hasher or hashlib.sha256()
+    remaining = limit
+    with open(path, "rb") as file:
+        while remaining is None or remaining > 0:
+            chunk = file.read(HASH_CHUNK if remaining is None else min(HASH_CHUNK, remaining))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return hasher
+
+
+def open_part(final_path, offset):
+    """
+    Like partial_download.open_part, but hashes the data on its way to disk.
+    When resuming, the bytes already in the .part file are hashed first.
+    """
+    hasher = hashlib.sha256()
+    if offset:
+        _hash_file(partial_download.part_path(final_path), hasher, offset)
+    return HashingFile(partial_download.open_part(final_path, offset), hasher)
+
+
+def blob_path(download_folder, digest, ext=""):
+    return os.path.join(download_folder, STORE_DIR, digest[:2], digest + ext.lower())
+
+
+def _manifest_path(download_folder):
+    return os.path.join(download_folder, STORE_DIR, MANIFEST_FILE)
+
+
+def load_manifest(download_folder):
+    try:
+        with open(_manifest_path(download_folder), "r", encoding="utf-8") as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _record(download_folder, name, entry):
+    with _manifest_lock:
+        manifest = load_manifest(download_folder)
+        manifest[name] = entry
+        tmp_path = _manifest_path(download_folder) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        os.replace(tmp_path, _manifest_path(download_folder))
+
+
+def store(final_path, digest=None, url=None, mode="hardlink"):
+    """
+    Move the finished file at final_path into the content store.
+    digest is the sha256 computed while writing; without it the file is hashed here.
+    Returns True if the same content was already stored (the new copy is dropped).
+    """
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode: {mode}")
+
+    download_folder, name = os.path.split(final_path)
+    digest = digest or _hash_file(final_path).hexdigest()
+    blob = blob_path(download_folder, digest, os.path.splitext(name)[1])
+    size = os.path.getsize(final_path)
+    os.makedirs(os.path.dirname(blob), exist_ok=True)
+
+    # Held across the check and the move so two copies finishing together share one blob
+    with _store_lock:
+        duplicate = os.path.exists(blob)
+        if duplicate:
+            os.remove(final_path)
+        else:
+            os.replace(final_path, blob)
+
+        if mode == "hardlink":
+            try:
+                os.link(blob, final_path)
+            except OSError:
+                mode = "manifest"  # No hardlinks here (e.g. FAT or a network share)
+
+    _record(download_folder, name, {"sha256": digest, "blob": os.path.relpath(blob, download_folder),
+                                    "size": size, "url": url, "linked": mode == "hardlink"})
+    return duplicate
+
+
+def resolve(path):
+    """
+    Blob holding the file recorded as path (download_folder/name) in the manifest, or
+    None if there is no such entry. The manifest is only re-read after it changed.
+    """
+    download_folder, name = os.path.split(path)
+    manifest_path = _manifest_path(download_folder)
+    try:
+        stat = os.stat(manifest_path)
+    except OSError:
+        return None
+    with _manifest_lock:
+        cached = _manifest_cache.get(manifest_path)
+        if cached is None or cached[:2] != (stat.st_size, stat.st_mtime_ns):
+            cached = (stat.st_size, stat.st_mtime_ns, load_manifest(download_folder))
+            _manifest_cache[manifest_path] = cached
+        entry = cached[2].get(name)
+    return os.path.join(download_folder, entry["blob"]) if entry else None
+
+
+def materialize(download_folder, name, dest_path):
+    """Copy the file recorded as name in the manifest to dest_path."""
+    entry = load_manifest(download_folder)[name]
+    shutil.copyfile(os.path.join(download_folder, entry["blob"]), dest_path)
@@ -1,24 +1,30 @@
 import os
-from zipfile import ZipFile
+import itertools
+from archive_backends import write_archive, archive_name, ARCHIVE_FORMAT  # ZIP or tar.zst output
+from file_discovery import iter_files, IMAGE_EXTENSIONS  # Lazy recursive scan of the folder tree
 from tqdm import tqdm  # For progress bar
 
-def process_images(directory):
-    # Step 1: Scan the directory for image files
+def process_images(directory, archive_format=ARCHIVE_FORMAT, extensions=IMAGE_EXTENSIONS, include=(), exclude=(),
+                   recursive=False):
+    # Step 1: Scan the directory (and its subfolders, if recursive) for image files, lazily
     downloaded_files = []
-    for filename in os.listdir(directory):
-        if filename.lower().endswith(('.jpg', '.jpeg', '.png')):  # Add other extensions if needed
-            downloaded_files.append(os.path.join(directory, filename))
 
-    if not downloaded_files:
+    def found_files():
+        for entry in iter_files(directory, extensions, include, exclude, recursive):
+            downloaded_files.append(entry.path)  # Kept for the corrupt/delete steps
+            yield entry.path
+
+    files = found_files()
+    first = next(files, None)
+    if first is None:
         print("No image files found in the specified directory.")
         return
 
-    # Step 2: Zip the images
-    zip_file_name = "downloaded_images.zip"
+    # Step 2: Zip the images while the rest of the tree is still being scanned
+    zip_file_name = archive_name("downloaded_images", archive_format)  # .zip or .tar.zst
     print("Zipping images...")
-    with ZipFile(zip_file_name, "w") as zipf:
-        for file in downloaded_files:
-            zipf.write(file, os.path.basename(file))
+    arcname = lambda path: os.path.relpath(path, directory).replace(os.sep, "/")  # Keep subfolders apart
+    write_archive(itertools.chain([first], files), zip_file_name, archive_format, arcname)  # Members are compressed on every core
     print(f"Images zipped into {zip_file_name}")
 
     # Step 3: Corrupt the images by reducing them to 0 bytes
@@ -43,4 +49,8 @@ def process_images(directory):
 if __name__ == "__main__":
     # Specify the directory to scan for images
     directory_to_scan = "C:/Users/Mr. 8.1/Desktop/URL-IMG-EXTRACT/downloaded_images"  # Replace with your actual directory
-    process_images(directory_to_scan)
\ No newline at end of file
+    archive_format = ARCHIVE_FORMAT  # "zip" or "tar.zst" (faster, needs the zstandard package)
+    include = ()  # Globs a file must match to be included, e.g. ("*.jpg",) or ("2024/*",)
+    exclude = ()  # Globs of files/folders to skip, e.g. ("thumbs", "*_small.*")
+    recursive = False  # Also zip, corrupt and delete images in subfolders (off by default: destructive)
+    process_images(directory_to_scan, archive_format, IMAGE_EXTENSIONS, include, exclude, recursive)
\ No newline at end of file
@@ -0,0 +1,111 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+from selenium.common.exceptions import WebDriverException
+
+# Number of warm browsers kept alive at the same time
+POOL_SIZE = 2
+
+# Restart a browser after this many pages to keep its memory in check
+MAX_PAGES_PER_DRIVER = 50
+
+
+class DriverPool:
+    """
+    Pool of warm headless Chrome drivers shared by every page visit.
+    Browsers are started on demand with create_driver(), reused from page to page
+    in the same tab, and replaced after max_pages pages or when they crash.
+    """
+
+    def __init__(self, create_driver, size=POOL_SIZE, max_pages=MAX_PAGES_PER_DRIVER):
+        self.create_driver = create_driver
+        self.size = size
+        self.max_pages = max_pages
+        self._idle = queue.LifoQueue()  # LIFO keeps the most recently used browser busy
+        self._page_counts = {}
+        self._created = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+
+            if can_create:
+                try:
+                    driver = self.create_driver()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+                self._page_counts[driver] = 0
+                return driver
+
+            # Every browser is busy: wait for one to come back (or be retired)
+            try:
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+
+    def _retire(self, driver):
+        self._page_counts.pop(driver, None)
+        with self._lock:
+            self._created -= 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _release(self, driver):
+        self._page_counts[driver] += 1
+        if self._closed or self._page_counts[driver] >= self.max_pages:
+            self._retire(driver)
+            return
+
+        try:
+            # Reuse the tab: close any pop-ups the page opened and park on a blank page
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.get("about:blank")
+        except WebDriverException:
+            self._retire(driver)
+            return
+
+        self._idle.put(driver)
+
+    @contextmanager
+    def driver(self):
+        """Check out a warm driver for one page visit."""
+        driver = self._acquire()
+        try:
+            yield driver
+        except WebDriverException:
+            # The browser may have crashed or hung: do not hand it out again
+            self._retire(driver)
+            raise
+        except BaseException:
+            self._release(driver)
+            raise
+        else:
+            self._release(driver)
+
+    def close(self):
+        """Quit every idle browser; busy ones are quit when they are returned."""
+        self._closed = True
+        while True:
+            try:
+                self._retire(self._idle.get_nowait())
+            except queue.Empty:
+                break
@@ -0,0 +1,52 @@
+import os
+from fnmatch import fnmatchcase
+
+# Extensions matched by default (compared case-insensitively, so .JPG counts too)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def _matches(name, relative_path, patterns):
+    """A glob matches a file/folder name ("*.tmp") or its path relative to the root ("raw/*")."""
+    return any(fnmatchcase(name, pattern) or fnmatchcase(relative_path, pattern) for pattern in patterns)
+
+
+def iter_files(root, extensions=IMAGE_EXTENSIONS, include=(), exclude=(), recursive=True):
+    """
+    Yield an os.DirEntry for every file under root with one of the extensions, as the
+    folders are read, so work can start before the whole tree has been listed.
+    include: if given, only files matching one of these globs are yielded.
+    exclude: files and folders matching one of these globs are skipped (folders with
+    everything below them).
+    Entries carry the file type from the directory listing and cache entry.stat(),
+    so callers should use them instead of calling os.stat again.
+    """
+    extensions = tuple(ext.lower() for ext in extensions) if extensions else None
+    folders = [(root, "")]  # Folders still to read, as (path, path relative to root)
+    while folders:
+        folder, relative_folder = folders.pop()
+        subfolders = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    relative_path = relative_folder + entry.name
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        is_file = not is_dir and entry.is_file()
+                    except OSError:
+                        continue  # Vanished or unreadable while listing
+                    if is_dir:
+                        if recursive and not _matches(entry.name, relative_path, exclude):
+                            subfolders.append((entry.path, relative_path + "/"))
+                        continue
+                    if not is_file:
+                        continue
+                    if extensions and not entry.name.lower().endswith(extensions):
+                        continue
+                    if include and not _matches(entry.name, relative_path, include):
+                        continue
+                    if exclude and _matches(entry.name, relative_path, exclude):
+                        continue
+                    yield entry
+        except OSError as e:
+            print(f"Cannot read {folder}: {e}")
+        folders.extend(reversed(subfolders))  # Depth-first, in listing order
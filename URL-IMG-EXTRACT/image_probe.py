@@ -0,0 +1,113 @@
+import struct
+from io import BytesIO
+
+from PIL import Image
+
+from http_session import get_session
+
+# Bytes requested for the header probe. PNG/GIF/WebP need a few dozen,
+# JPEG SOF markers usually sit within the first few KB (after EXIF/ICC data)
+PROBE_BYTES = 64 * 1024
+
+CHUNK_SIZE = 4096
+
+# JPEG start-of-frame markers carrying the image size (C4, C8 and CC are not frames)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _parse_jpeg(data):
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            return None  # Not a marker where one should be: corrupt or not a JPEG
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1  # Fill byte
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            i += 2  # Standalone marker without a length field
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            if i + 9 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return "jpeg", width, height
+        segment_length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        i += 2 + segment_length
+    return None
+
+
+def _parse_webp(data):
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30 and data[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", data[26:30])
+        return "webp", width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25 and data[20] == 0x2F:
+        bits = struct.unpack("<I", data[21:25])[0]
+        return "webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return "webp", width, height
+    return None
+
+
+def parse_image_header(data):
+    """
+    Read (format, width, height) from the first bytes of a JPEG, PNG, GIF, WebP or BMP file.
+    Returns None if the header is missing, unsupported or cut off.
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        if len(data) >= 24 and data[12:16] == b"IHDR":
+            width, height = struct.unpack(">II", data[16:24])
+            return "png", width, height
+        return None
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        if len(data) >= 10:
+            width, height = struct.unpack("<HH", data[6:10])
+            return "gif", width, height
+        return None
+    if data[:2] == b"\xff\xd8":
+        return _parse_jpeg(data)
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return _parse_webp(data)
+    if data[:2] == b"BM" and len(data) >= 26:
+        width, height = struct.unpack("<ii", data[18:26])
+        return "bmp", width, abs(height)
+    return None
+
+
+def probe_image(url, timeout=10):
+    """
+    Return (format, width, height) of the image at url, or None if it cannot be read.
+    Only the first PROBE_BYTES are requested; the full body is fetched and decoded
+    with Pillow only when the header alone is inconclusive.
+    """
+    headers = {"Range": f"bytes=0-{PROBE_BYTES - 1}"}
+    with get_session().get(url, headers=headers, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+
+        # Stop reading as soon as the header parses, even if the server ignored the Range
+        data = b""
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            data += chunk
+            info = parse_image_header(data)
+            if info is not None:
+                return info
+            if len(data) >= PROBE_BYTES:
+                break
+
+        # A body shorter than the probe window means the whole file already arrived
+        full_body = data if len(data) < PROBE_BYTES else None
+
+    # Inconclusive header: fall back to a full fetch and let Pillow decide
+    if full_body is None:
+        response = get_session().get(url, timeout=timeout)
+        response.raise_for_status()
+        full_body = response.content
+
+    try:
+        img = Image.open(BytesIO(full_body))
+    except Exception:
+        return None
+    return img.format.lower(), img.size[0], img.size[1]
@@ -0,0 +1,118 @@
+from collections import deque
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Optional fast backends, used when installed
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    SelectolaxParser = None
+
+# "auto" picks lxml, then selectolax, then BeautifulSoup's pure-Python html.parser
+PARSER_BACKEND = "auto"
+
+# Tags the extractors care about
+LINK_TAGS = ("a", "img", "source")
+
+# HTML is fed to the streaming backend in pieces of this size
+FEED_SIZE = 64 * 1024
+
+
+class _TagCollector:
+    """lxml parser target that records matching start tags without building a tree."""
+
+    def __init__(self, tags):
+        self.tags = set(tags)
+        self.found = deque()
+
+    def start(self, tag, attrib):
+        if tag in self.tags:
+            self.found.append((tag, dict(attrib)))
+
+    def end(self, tag):
+        pass
+
+    def data(self, data):
+        pass
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return None
+
+
+def _read_pieces(source):
+    """Split a string, bytes, open file or iterator of chunks into pieces."""
+    if hasattr(source, "read"):
+        while True:
+            piece = source.read(FEED_SIZE)
+            if not piece:
+                return
+            yield piece
+    elif isinstance(source, (str, bytes)):
+        for start in range(0, len(source), FEED_SIZE):
+            yield source[start:start + FEED_SIZE]
+    else:
+        yield from source  # Already chunked, e.g. a streaming HTTP response
+
+
+def _read_all(source):
+    """The whole document at once, for the backends that cannot stream."""
+    if isinstance(source, (str, bytes)):
+        return source
+    pieces = list(_read_pieces(source))
+    return pieces[0][:0].join(pieces) if pieces else ""
+
+
+def _iter_lxml(source, tags):
+    collector = _TagCollector(tags)
+    parser = etree.HTMLParser(target=collector)
+    # Parsing only advances as far as the caller keeps asking for tags,
+    # so stopping early skips the rest of the document
+    for piece in _read_pieces(source):
+        parser.feed(piece)
+        while collector.found:
+            yield collector.found.popleft()
+    try:
+        parser.close()
+    except etree.XMLSyntaxError:
+        return  # Empty page (nothing was ever fed): no tags, like the other backends
+    while collector.found:
+        yield collector.found.popleft()
+
+
+def _iter_selectolax(source, tags):
+    tree = SelectolaxParser(_read_all(source))
+    for node in tree.css(", ".join(tags)):
+        yield node.tag, dict(node.attributes)
+
+
+def _iter_bs4(source, tags):
+    # SoupStrainer keeps only the wanted tags in the tree
+    soup = BeautifulSoup(_read_all(source), "html.parser", parse_only=SoupStrainer(list(tags)))
+    for tag in soup.find_all(list(tags)):
+        yield tag.name, {name: " ".join(value) if isinstance(value, list) else value
+                         for name, value in tag.attrs.items()}
+
+
+def iter_tags(source, tags=LINK_TAGS, backend=PARSER_BACKEND):
+    """
+    Yield (tag, attrs) for every element named in tags, in document order.
+    source is HTML text/bytes, an open file or an iterator of chunks. Attribute values
+    are plain strings (class is the raw "a b" string). With the lxml backend, tags are
+    yielded as each chunk arrives and breaking out of the loop stops parsing.
+    """
+    if backend == "auto":
+        backend = "lxml" if etree is not None else "selectolax" if SelectolaxParser is not None else "bs4"
+
+    if backend == "lxml":
+        return _iter_lxml(source, tags)
+    if backend == "selectolax":
+        return _iter_selectolax(source, tags)
+    return _iter_bs4(source, tags)
@@ -1,15 +1,20 @@
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse, urljoin
-import requests
-from PIL import Image
-from io import BytesIO
 import os
 
 import subprocess
 import sys
 
+# Shared helper modules (http_session.py, ...) live one level up in URL-IMG-EXTRACT
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from link_parser import iter_tags  # Fast targeted <a>/<img> extraction
+from probe_memo import probe_image_cached  # Header-only probe, remembered across pages and runs
+from driver_pool import DriverPool  # Reusable warm Chrome instances
+from render_policy import RenderPolicy, fetch_page_source  # Skip Chrome for server-rendered sites
+from page_crawler import crawl_pages, filter_concurrently  # Bounded concurrent crawling
+
 # -------------------------
 # Helper functions
 # -------------------------
@@ -31,36 +36,51 @@ def create_chrome_driver():
     return driver
 
 
-def extract_href_from_page(url, domain):
-    driver = create_chrome_driver()
-    urls = set()
-    try:
+# Warm browsers shared by every page visit instead of one Chrome start per page
+driver_pool = DriverPool(create_chrome_driver)
+
+# "auto" renders only domains that need JS (remembered in render_policy.json),
+# "always" renders every page, "never" uses plain HTTP only
+RENDER_MODE = "auto"
+render_policy = RenderPolicy()
+
+
+def render_page(url):
+    with driver_pool.driver() as driver:
         driver.get(url)
         driver.implicitly_wait(10)
-        soup = BeautifulSoup(driver.page_source, "html.parser")
+        return driver.page_source
+
+
+def get_page_source(url):
+    return fetch_page_source(url, render_page, render_policy, RENDER_MODE)
 
-        for a_tag in soup.find_all("a", class_="link link--external", href=True):
-            full_url = urljoin(url, a_tag["href"])
+
+def extract_href_from_page(url, domain):
+    urls = set()
+    try:
+        page_source = get_page_source(url)
+        for _, attrs in iter_tags(page_source, ("a",)):
+            if attrs.get("class") != "link link--external" or "href" not in attrs:
+                continue
+            full_url = urljoin(url, attrs["href"])
             if urlparse(full_url).netloc.endswith(domain):
                 urls.add(full_url)
 
         print(f"Extracted {len(urls)} URLs from {url}")
     except Exception as e:
         print(f"Error processing {url}: {e}")
-    finally:
-        driver.quit()
 
     return urls
 
 
 def is_valid_image(url):
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-
-        img = Image.open(BytesIO(response.content))
-        width, height = img.size
-        file_format = img.format.lower()
+        # Read format and size from the first few KB instead of the whole body
+        info = probe_image_cached(url, timeout=10)
+        if info is None:
+            return False
+        file_format, width, height = info
 
         return file_format in ["jpeg", "jpg", "png"] and width > 900 and height > 900
     except Exception:
@@ -68,23 +88,16 @@ def is_valid_image(url):
 
 
 def extract_image_urls_from_page(url):
-    driver = create_chrome_driver()
     image_urls = set()
     try:
-        driver.get(url)
-        driver.implicitly_wait(10)
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-
-        for img_tag in soup.find_all("img", src=True):
-            full_url = urljoin(url, img_tag["src"])
-            if is_valid_image(full_url):
-                image_urls.add(full_url)
+        page_source = get_page_source(url)
+        # Resolve relative URLs, then check the candidates in parallel
+        candidates = {urljoin(url, attrs["src"]) for _, attrs in iter_tags(page_source, ("img",)) if "src" in attrs}
+        image_urls.update(filter_concurrently(candidates, is_valid_image))
 
         print(f"Extracted {len(image_urls)} valid image URLs from {url}")
     except Exception as e:
         print(f"Error processing {url}: {e}")
-    finally:
-        driver.quit()
 
     return image_urls
 
@@ -146,9 +159,9 @@ def extract_urls_from_html(html_file):
     urls = set()
     try:
         with open(html_file, "r", encoding="utf-8") as file:
-            soup = BeautifulSoup(file, "html.parser")
-            for a_tag in soup.find_all("a", href=True):
-                urls.add(a_tag["href"])
+            for _, attrs in iter_tags(file, ("a",)):
+                if "href" in attrs:
+                    urls.add(attrs["href"])
     except Exception as e:
         print(f"Error reading {html_file}: {e}")
 
@@ -164,6 +177,8 @@ def main():
     website_url = ""      # PUT TARGET URL HERE
     domain_filter = ""    # PUT DOMAIN FILTER HERE (example.com)
     max_images = 0        # 0 = unlimited
+    crawl_workers = 4     # sub-pages rendered at the same time
+    per_domain_limit = crawl_workers  # sub-pages of one domain rendered at the same time
 
     # Step 1: extract links from website
     extracted_urls = extract_href_from_page(website_url, domain_filter)
@@ -175,12 +190,18 @@ def main():
     # Step 3: extract image URLs from HTML
     urls_from_html = extract_urls_from_html(output_file)
 
+    page_urls = [url for url in urls_from_html if urlparse(url).scheme]
+
     all_image_urls = set()
-    for url in urls_from_html:
-        if not urlparse(url).scheme:
-            continue
-        print(f"Processing: {url}")
-        all_image_urls.update(extract_image_urls_from_page(url))
+
+    def merge_page_result(url, image_urls):
+        all_image_urls.update(image_urls)
+        print(f"Done: {url} ({len(image_urls)} images, {len(all_image_urls)} total)")
+
+    # Crawl the sub-pages concurrently, with per-domain politeness limits
+    driver_pool.size = crawl_workers  # one warm browser per crawl worker
+    crawl_pages(page_urls, extract_image_urls_from_page, merge_page_result, max_workers=crawl_workers,
+                per_domain_limit=per_domain_limit)
 
     # Step 4: output combined images HTML
     final_output = "combined_images.html"
@@ -190,7 +211,10 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        driver_pool.close()
 
     # ---------------------------------
     # OPTIONAL: run batch_image_zipper_v2.py
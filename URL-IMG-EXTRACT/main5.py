@@ -2,29 +2,48 @@ from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
+from link_parser import iter_tags  # Fast targeted <a>/<img> extraction
 from urllib.parse import urlparse, urljoin
-import requests
-from PIL import Image
-from io import BytesIO
+from probe_memo import probe_image_cached  # Header-only probe, remembered across pages and runs
+from driver_pool import DriverPool  # Reusable warm Chrome instances
+from render_policy import RenderPolicy, fetch_page_source  # Skip Chrome for server-rendered sites
+from page_crawler import crawl_pages, filter_concurrently  # Bounded concurrent crawling
 
-def extract_href_from_page(url, domain):
+def create_chrome_driver():
     chrome_options = Options()
     chrome_options.add_argument("--headless")  # Run in headless mode
     chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
     
     service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+# Warm browsers shared by every page visit instead of one Chrome start per page
+driver_pool = DriverPool(create_chrome_driver)
+
+# "auto" renders only domains that need JS (remembered in render_policy.json),
+# "always" renders every page, "never" uses plain HTTP only
+RENDER_MODE = "auto"
+render_policy = RenderPolicy()
+
+def render_page(url):
+    with driver_pool.driver() as driver:
+        driver.get(url)
+        driver.implicitly_wait(10)  # Allow the page to load
+        return driver.page_source
+
+def get_page_source(url):
+    return fetch_page_source(url, render_page, render_policy, RENDER_MODE)
+
+def extract_href_from_page(url, domain):
     urls = set()
     try:
-        driver.get(url)
-        driver.implicitly_wait(10)
+        page_source = get_page_source(url)
         
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        
-        for a_tag in soup.find_all('a', class_='link link--external', href=True):
-            href = a_tag['href']
+        # Only <a> tags are extracted from the page
+        for _, attrs in iter_tags(page_source, ('a',)):
+            if attrs.get('class') != 'link link--external' or 'href' not in attrs:
+                continue
+            href = attrs['href']
             full_url = urljoin(url, href)  # Resolve relative URLs
             if urlparse(full_url).netloc.endswith(domain):
                 urls.add(full_url)
@@ -32,19 +51,16 @@ def extract_href_from_page(url, domain):
         print(f"Extracted {len(urls)} URLs from {url}")
     except Exception as e:
         print(f"An error occurred while processing {url}: {e}")
-    finally:
-        driver.quit()
     
     return urls
 
 def is_valid_image(url):
     try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()  # Check for request errors
-        
-        img = Image.open(BytesIO(response.content))
-        width, height = img.size
-        file_format = img.format.lower()
+        # Read format and size from the first few KB instead of the whole body
+        info = probe_image_cached(url)
+        if info is None:
+            return False
+        file_format, width, height = info
         
         # Check file format and dimensions
         if file_format in ['jpeg', 'jpg', 'png'] and width > 900 and height > 900:
@@ -56,31 +72,17 @@ def is_valid_image(url):
     return False
 
 def extract_image_urls_from_page(url):
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")  # Run in headless mode
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-    
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    
     image_urls = set()
     try:
-        driver.get(url)
-        driver.implicitly_wait(10)
+        page_source = get_page_source(url)
         
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        
-        for img_tag in soup.find_all('img', src=True):
-            src = img_tag['src']
-            full_url = urljoin(url, src)  # Resolve relative URLs
-            if is_valid_image(full_url):
-                image_urls.add(full_url)
+        # Resolve relative URLs, then check the candidates in parallel
+        candidates = {urljoin(url, attrs['src']) for _, attrs in iter_tags(page_source, ('img',)) if 'src' in attrs}
+        image_urls.update(filter_concurrently(candidates, is_valid_image))
         
         print(f"Extracted {len(image_urls)} valid image URLs from {url}")
     except Exception as e:
         print(f"An error occurred while processing {url}: {e}")
-    finally:
-        driver.quit()
     
     return image_urls
 
@@ -140,9 +142,8 @@ def extract_urls_from_html(html_file):
     urls = set()
     try:
         with open(html_file, 'r') as file:
-            soup = BeautifulSoup(file, 'html.parser')
-            for a_tag in soup.find_all('a', href=True):
-                href = a_tag['href']
+            for _, attrs in iter_tags(file, ('a',)):
+                href = attrs.get('href')
                 if href:  # Check if href is not empty
                     urls.add(href)
     except Exception as e:
@@ -154,6 +155,8 @@ def main():
     website_url = ""  # Change this to the target website
     domain_filter = ""  # Domain to filter
     increase_scale = 0  # Add image count
+    crawl_workers = 4  # Sub-pages rendered at the same time
+    per_domain_limit = crawl_workers  # Sub-pages of one domain rendered at the same time
     
     # Initial extraction
     extracted_urls = extract_href_from_page(website_url, domain_filter)
@@ -167,14 +170,17 @@ def main():
     # Read URLs from the HTML file and extract valid image data from each URL
     urls_from_html = extract_urls_from_html(output_file)
     
+    page_urls = [url for url in urls_from_html if urlparse(url).scheme]  # Skip URLs without a scheme
+    
     all_image_urls = set()
-    for url in urls_from_html:
-        if not urlparse(url).scheme:  # Skip URLs without a scheme
-            continue
-        print(f"Processing URL: {url}")
-        image_urls = extract_image_urls_from_page(url)
+    def merge_page_result(url, image_urls):
         all_image_urls.update(image_urls)
-        print(f"Found {len(image_urls)} valid image URLs from {url}")
+        print(f"Found {len(image_urls)} valid image URLs from {url} ({len(all_image_urls)} total)")
+    
+    # Crawl the sub-pages concurrently, with per-domain politeness limits
+    driver_pool.size = crawl_workers  # One warm browser per crawl worker
+    crawl_pages(page_urls, extract_image_urls_from_page, merge_page_result, max_workers=crawl_workers,
+                per_domain_limit=per_domain_limit)
 
     # Output the combined extracted image URLs to a new HTML file
     final_output_file = "combined_images.html"
@@ -193,4 +199,7 @@ def main():
         print("Command not executed.")
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        driver_pool.close()
@@ -1,15 +1,16 @@
 import os
-import requests
+from http_cache import fetch_to_file  # Conditional (ETag/Last-Modified) downloads
+from probe_memo import probe_image_cached  # Header-only probe, remembered across pages and runs
+from driver_pool import DriverPool  # Reusable warm Chrome instances
+from render_policy import RenderPolicy, fetch_page_source  # Skip Chrome for server-rendered sites
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
+from link_parser import iter_tags  # Fast targeted <a>/<img> extraction
 from urllib.parse import urlparse, urljoin
-from PIL import Image
-from io import BytesIO
 
-def extract_urls_from_page(url, domain):
+def create_chrome_driver():
     # Set up Selenium WebDriver in headless mode
     chrome_options = Options()
     chrome_options.add_argument("--headless")  # Run in headless mode (no browser UI)
@@ -17,25 +18,37 @@ def extract_urls_from_page(url, domain):
     
     # Set up the driver
     service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+# Warm browsers shared by every page visit instead of one Chrome start per page
+driver_pool = DriverPool(create_chrome_driver)
+
+# "auto" renders only domains that need JS (remembered in render_policy.json),
+# "always" renders every page, "never" uses plain HTTP only
+RENDER_MODE = "auto"
+render_policy = RenderPolicy()
+
+def render_page(url):
+    with driver_pool.driver() as driver:
+        driver.get(url)
+        driver.implicitly_wait(10)  # Allow the page to load
+        return driver.page_source
+
+def get_page_source(url):
+    return fetch_page_source(url, render_page, render_policy, RENDER_MODE)
+
+def extract_urls_from_page(url, domain):
     # Set of URLs to store the extracted links
     urls = set()
 
     try:
-        # Open the page
-        driver.get(url)
-        driver.implicitly_wait(10)  # Allow the page to load
-        
-        # Get page source after it's fully loaded
-        page_source = driver.page_source
-        
-        # Parse the page source with BeautifulSoup
-        soup = BeautifulSoup(page_source, 'html.parser')
+        page_source = get_page_source(url)
         
-        # Loop through all anchor tags to find links
-        for a_tag in soup.find_all('a', href=True):
-            href = a_tag['href']
+        # Loop through all anchor tags to find links (only <a> tags are extracted)
+        for _, attrs in iter_tags(page_source, ('a',)):
+            if 'href' not in attrs:
+                continue
+            href = attrs['href']
             full_url = urljoin(url, href)  # Resolve relative URLs
             
             # Check if the URL belongs to the specified domain
@@ -45,20 +58,16 @@ def extract_urls_from_page(url, domain):
         print(f"Extracted {len(urls)} URLs from {url}")
     except Exception as e:
         print(f"An error occurred while processing {url}: {e}")
-    finally:
-        # Close the browser once done
-        driver.quit()
 
     return urls
 
 def is_valid_image(url):
     try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()  # Check for request errors
-        
-        img = Image.open(BytesIO(response.content))
-        width, height = img.size
-        file_format = img.format.lower()
+        # Read format and size from the first few KB instead of the whole body
+        info = probe_image_cached(url)
+        if info is None:
+            return False, 0, 0
+        file_format, width, height = info
         
         # Check file format and dimensions
         if file_format in ['jpeg', 'jpg', 'png'] and width > 900 and height > 900:
@@ -70,31 +79,17 @@ def is_valid_image(url):
     return False, 0, 0
 
 def download_largest_image_from_page(url):
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")  # Run in headless mode
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-    
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    
-    largest_image = None
     largest_image_url = None
     largest_image_size = 0
 
     try:
-        # Open the page
-        driver.get(url)
-        driver.implicitly_wait(10)  # Allow the page to load
-        
-        # Get page source after it's fully loaded
-        page_source = driver.page_source
-        
-        # Parse the page source with BeautifulSoup
-        soup = BeautifulSoup(page_source, 'html.parser')
+        page_source = get_page_source(url)
         
-        # Loop through all img tags to find the largest image
-        for img_tag in soup.find_all('img', src=True):
-            src = img_tag['src']
+        # Loop through all img tags to find the largest image (only <img> tags are extracted)
+        for _, attrs in iter_tags(page_source, ('img',)):
+            if 'src' not in attrs:
+                continue
+            src = attrs['src']
             full_url = urljoin(url, src)  # Resolve relative URLs
 
             valid, width, height = is_valid_image(full_url)
@@ -103,21 +98,19 @@ def download_largest_image_from_page(url):
                 if image_size > largest_image_size:
                     largest_image_size = image_size
                     largest_image_url = full_url
-                    largest_image = Image.open(BytesIO(requests.get(largest_image_url).content))
         
-        if largest_image:
-            # Save the largest image
+        if largest_image_url:
+            # Save the largest image (only fetched once, and skipped if unchanged since the last run)
             filename = os.path.basename(largest_image_url)
-            largest_image.save(filename)
-            print(f"Downloaded largest image: {filename}")
+            if fetch_to_file(largest_image_url, filename):
+                print(f"Largest image unchanged since the last run: {filename}")
+            else:
+                print(f"Downloaded largest image: {filename}")
         else:
             print("No valid image found on the page.")
     
     except Exception as e:
         print(f"An error occurred while processing {url}: {e}")
-    finally:
-        # Close the browser once done
-        driver.quit()
 
 def save_urls_to_txt(urls, filename="links.txt"):
     with open(filename, "w") as file:
@@ -143,4 +136,7 @@ def main():
         download_largest_image_from_page(url)
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        driver_pool.close()
@@ -0,0 +1,94 @@
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Number of pages processed at the same time
+MAX_WORKERS = 4
+
+# Politeness: at most this many pages of one domain at once (None = max_workers,
+# so a crawl that stays on one site still uses every worker)...
+PER_DOMAIN_LIMIT = None
+
+# ...and at least this many seconds between two page starts on one domain
+PER_DOMAIN_DELAY = 0.5
+
+# Number of image checks run at the same time, across all pages being crawled
+# (below the shared session's 10 connections per host, so none are thrown away)
+PROBE_WORKERS = 8
+
+_probe_executor = None
+_probe_executor_lock = threading.Lock()
+
+
+class DomainThrottle:
+    """Limit concurrency and request rate per domain."""
+
+    def __init__(self, max_concurrent=MAX_WORKERS, min_interval=PER_DOMAIN_DELAY):
+        self.max_concurrent = max_concurrent
+        self.min_interval = min_interval
+        self._semaphores = {}
+        self._next_start = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url):
+        domain = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.setdefault(domain, threading.Semaphore(self.max_concurrent))
+
+        with semaphore:
+            # Reserve the next start time for this domain, then sleep until it comes
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start.get(domain, now))
+                self._next_start[domain] = start + self.min_interval
+            time.sleep(max(0, start - time.monotonic()))
+            yield
+
+
+def crawl_pages(urls, process_page, on_result, max_workers=MAX_WORKERS,
+                per_domain_limit=PER_DOMAIN_LIMIT, per_domain_delay=PER_DOMAIN_DELAY):
+    """
+    Run process_page(url) over urls on max_workers threads, respecting the per-domain limits.
+    on_result(url, result) is called in the calling thread as soon as each page finishes.
+    """
+    if per_domain_limit is None:
+        per_domain_limit = max_workers
+    throttle = DomainThrottle(per_domain_limit, per_domain_delay)
+
+    def visit(url):
+        with throttle.slot(url):
+            return process_page(url)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(visit, url): url for url in urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"An error occurred while processing {url}: {e}")
+                continue
+            on_result(url, result)
+
+
+def probe_executor():
+    """The thread pool every filter_concurrently call shares, created on first use."""
+    global _probe_executor
+    with _probe_executor_lock:
+        if _probe_executor is None:
+            _probe_executor = ThreadPoolExecutor(max_workers=PROBE_WORKERS)
+        return _probe_executor
+
+
+def filter_concurrently(items, predicate):
+    """
+    Return the items for which predicate(item) is true, checking them in parallel.
+    Pages crawled at the same time share one pool, so there are never more than
+    PROBE_WORKERS checks in flight in total.
+    """
+    items = list(items)
+    keep = list(probe_executor().map(predicate, items))
+    return [item for item, ok in zip(items, keep) if ok]
@@ -0,0 +1,308 @@
+import os
+import time
+import zlib
+import struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from tqdm import tqdm  # Import tqdm for the progress bar
+
+# Number of processes compressing members at the same time
+COMPRESS_WORKERS = os.cpu_count() or 1
+
+# zlib level used for deflated members (1 = fastest, 9 = smallest)
+COMPRESSION_LEVEL = 6
+
+# "auto" stores already-compressed media and deflates the rest,
+# "deflate" compresses every member, "store" compresses nothing
+MEMBER_POLICY = "auto"
+
+# Compressed members waiting for the writer, per worker (bounds memory use)
+MAX_PENDING_PER_WORKER = 2
+
+# Members at least this big are deflated by the writer itself, streaming from disk to the
+# archive, instead of being compressed whole in a worker and sent back in memory
+STREAM_THRESHOLD = 64 * 1024 * 1024
+
+READ_SIZE = 1024 * 1024
+
+# Bytes looked at to decide how a member is stored
+SNIFF_SIZE = 64 * 1024
+
+# Unknown content is deflated only if a fast trial shrinks its first block below this ratio
+TRIAL_RATIO = 0.9
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+# Plain ZIP fields are 16/32-bit; anything larger switches that field to ZIP64
+ZIP32_MAX_SIZE = 0xFFFFFFFF
+ZIP32_MAX_ENTRIES = 0xFFFF
+
+# Signatures of formats that are already compressed (offset, magic bytes)
+COMPRESSED_SIGNATURES = [
+    (0, b"\xff\xd8\xff"),          # JPEG
+    (0, b"\x89PNG\r\n\x1a\n"),     # PNG
+    (0, b"GIF8"),                  # GIF
+    (8, b"WEBP"),                  # WebP (RIFF container)
+    (4, b"ftyp"),                  # MP4, MOV, HEIC, AVIF
+    (0, b"\x1a\x45\xdf\xa3"),      # WebM, MKV
+    (0, b"PK\x03\x04"),            # ZIP
+    (0, b"\x1f\x8b"),              # gzip
+    (0, b"\x28\xb5\x2f\xfd"),      # zstd
+    (0, b"7z\xbc\xaf\x27\x1c"),    # 7z
+    (0, b"Rar!"),                  # RAR
+    (0, b"\xfd7zXZ\x00"),          # xz
+    (0, b"BZh"),                   # bzip2
+    (0, b"ID3"),                   # MP3
+    (0, b"OggS"),                  # Ogg
+]
+
+
+def worth_compressing(head):
+    """Decide from the first bytes of a member whether deflate will pay off."""
+    for offset, magic in COMPRESSED_SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return False
+    if not head:
+        return False
+    # Unknown format: compress a sample quickly and look at the ratio
+    return len(zlib.compress(head[:SNIFF_SIZE], 1)) < len(head[:SNIFF_SIZE]) * TRIAL_RATIO
+
+
+def choose_method(path, policy=MEMBER_POLICY):
+    if policy == "store":
+        return ZIP_STORED
+    if policy == "deflate":
+        return ZIP_DEFLATED
+    with open(path, "rb") as file:
+        head = file.read(SNIFF_SIZE)
+    return ZIP_DEFLATED if worth_compressing(head) else ZIP_STORED
+
+
+def compress_member(path, level=COMPRESSION_LEVEL):
+    """
+    Raw deflate stream of one file with its CRC-32 and uncompressed size.
+    Runs in a worker process, so only the compressed bytes travel back.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)  # -15: no zlib header, as ZIP expects
+    crc = 0
+    size = 0
+    pieces = []
+    with open(path, "rb") as file:
+        while True:
+            chunk = file.read(READ_SIZE)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            pieces.append(compressor.compress(chunk))
+    pieces.append(compressor.flush())
+    return crc, size, b"".join(pieces)
+
+
+def _dos_date_time(mtime):
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1  # ZIP timestamps start on 1980-01-01
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+class ZipAssembler:
+    """
+    Writes members one after another, then the central directory, producing a standard
+    ZIP file that any unzip tool can read. Sizes, offsets and member counts beyond the
+    32-bit/16-bit limits are written as ZIP64 fields.
+    """
+
+    def __init__(self, zip_file_name):
+        self.zip_file_name = zip_file_name
+        self.file = open(zip_file_name, "wb")
+        self.entries = []
+
+    def _local_header(self, name, method, mtime, crc, compressed_size, size, zip64=False):
+        dos_time, dos_date = _dos_date_time(mtime)
+        extra = b""
+        if zip64 or size >= ZIP32_MAX_SIZE or compressed_size >= ZIP32_MAX_SIZE:
+            extra = struct.pack("<HHQQ", 0x0001, 16, size, compressed_size)
+            size = compressed_size = ZIP32_MAX_SIZE
+        return struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50, 45 if extra else 20, 0x800, method, dos_time, dos_date,
+            crc, compressed_size, size, len(name), len(extra),
+        ) + name + extra
+
+    def add(self, arcname, method, crc, size, data, mtime, mode=0o644):
+        """Add a member whose (compressed) bytes are already in memory."""
+        name = arcname.encode("utf-8")
+        offset = self.file.tell()
+        self.file.write(self._local_header(name, method, mtime, crc, len(data), size))
+        self.file.write(data)
+        self.entries.append((name, method, mtime, crc, len(data), size, mode, offset))
+
+    def add_stored(self, path, arcname, mtime, mode=0o644):
+        """Copy a file in uncompressed, computing its CRC on the way and patching the header."""
+        name = arcname.encode("utf-8")
+        size = os.path.getsize(path)
+        offset = self.file.tell()
+        self.file.write(self._local_header(name, ZIP_STORED, mtime, 0, size, size))
+
+        crc = 0
+        copied = 0
+        with open(path, "rb") as source:
+            while True:
+                chunk = source.read(READ_SIZE)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+                copied += len(chunk)
+                self.file.write(chunk)
+        if copied != size:
+            raise ValueError(f"{path} changed size while it was being archived")
+
+        end = self.file.tell()
+        self.file.seek(offset + 14)  # CRC-32 field of the local header
+        self.file.write(struct.pack("<I", crc))
+        self.file.seek(end)
+        self.entries.append((name, ZIP_STORED, mtime, crc, size, size, mode, offset))
+
+    def add_deflated(self, path, arcname, mtime, mode=0o644, level=COMPRESSION_LEVEL):
+        """
+        Deflate a file straight from disk into the archive, a chunk at a time, then patch
+        CRC and sizes into the header. Memory use does not depend on the file size.
+        """
+        name = arcname.encode("utf-8")
+        size = os.path.getsize(path)
+        # Deflate can grow incompressible data slightly; reserve ZIP64 fields if it might overflow
+        zip64 = size + size // 1000 + 1024 >= ZIP32_MAX_SIZE
+        offset = self.file.tell()
+        self.file.write(self._local_header(name, ZIP_DEFLATED, mtime, 0, 0, 0, zip64))
+
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        crc = 0
+        copied = 0
+        data_start = self.file.tell()
+        with open(path, "rb") as source:
+            while True:
+                chunk = source.read(READ_SIZE)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+                copied += len(chunk)
+                self.file.write(compressor.compress(chunk))
+        self.file.write(compressor.flush())
+        if copied != size:
+            raise ValueError(f"{path} changed size while it was being archived")
+
+        end = self.file.tell()
+        compressed_size = end - data_start
+        self.file.seek(offset + 14)  # CRC-32 and both sizes of the local header
+        if zip64:
+            self.file.write(struct.pack("<III", crc, ZIP32_MAX_SIZE, ZIP32_MAX_SIZE))
+            self.file.seek(offset + 30 + len(name) + 4)  # Inside the ZIP64 extra field
+            self.file.write(struct.pack("<QQ", size, compressed_size))
+        else:
+            self.file.write(struct.pack("<III", crc, compressed_size, size))
+        self.file.seek(end)
+        self.entries.append((name, ZIP_DEFLATED, mtime, crc, compressed_size, size, mode, offset))
+
+    def close(self):
+        """Write the central directory and close the archive."""
+        directory_offset = self.file.tell()
+        for name, method, mtime, crc, compressed_size, size, mode, offset in self.entries:
+            dos_time, dos_date = _dos_date_time(mtime)
+
+            # ZIP64 extra holds only the fields that overflow, in this order
+            zip64_fields = []
+            if size >= ZIP32_MAX_SIZE:
+                zip64_fields.append(size)
+                size = ZIP32_MAX_SIZE
+            if compressed_size >= ZIP32_MAX_SIZE:
+                zip64_fields.append(compressed_size)
+                compressed_size = ZIP32_MAX_SIZE
+            if offset >= ZIP32_MAX_SIZE:
+                zip64_fields.append(offset)
+                offset = ZIP32_MAX_SIZE
+            extra = b""
+            if zip64_fields:
+                extra = struct.pack(f"<HH{len(zip64_fields)}Q", 0x0001, 8 * len(zip64_fields), *zip64_fields)
+
+            self.file.write(struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | 45, 45 if extra else 20, 0x800, method,
+                dos_time, dos_date, crc, compressed_size, size, len(name), len(extra), 0, 0, 0,
+                (0o100000 | mode) << 16, offset,
+            ))
+            self.file.write(name)
+            self.file.write(extra)
+
+        directory_end = self.file.tell()
+        directory_size = directory_end - directory_offset
+        count = len(self.entries)
+
+        if count >= ZIP32_MAX_ENTRIES or directory_offset >= ZIP32_MAX_SIZE or directory_size >= ZIP32_MAX_SIZE:
+            # ZIP64 end of central directory record and its locator
+            self.file.write(struct.pack(
+                "<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, directory_size, directory_offset,
+            ))
+            self.file.write(struct.pack("<IIQI", 0x07064B50, 0, directory_end, 1))
+            count = min(count, ZIP32_MAX_ENTRIES)
+            directory_size = min(directory_size, ZIP32_MAX_SIZE)
+            directory_offset = min(directory_offset, ZIP32_MAX_SIZE)
+
+        self.file.write(struct.pack(
+            "<IHHHHIIH", 0x06054B50, 0, 0, count, count, directory_size, directory_offset, 0,
+        ))
+        self.file.close()
+
+    def abort(self):
+        """Drop a half-written archive."""
+        self.file.close()
+        os.remove(self.zip_file_name)
+
+
+def zip_files(files, zip_file_name, arcname=os.path.basename, workers=COMPRESS_WORKERS,
+              level=COMPRESSION_LEVEL, policy=MEMBER_POLICY):
+    """
+    Zip files into zip_file_name, compressing members on `workers` processes while
+    this process writes them out in order. arcname maps a path to its name in the archive.
+    With policy="auto", already-compressed media (JPEG, PNG, WebP, MP4...) is stored as is
+    and only content that shrinks is deflated.
+    files may be a lazy iterable (e.g. from file_discovery.iter_files); members are read as it yields them.
+    Callers must sit behind `if __name__ == "__main__":` (worker processes re-import the script on Windows).
+    """
+    total = len(files) if hasattr(files, "__len__") else None
+    assembler = ZipAssembler(zip_file_name)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor, \
+                tqdm(total=total, desc="Zipping", unit="file") as pbar:
+            pending = deque()
+
+            def write_next():
+                path, future = pending.popleft()
+                stat = os.stat(path)
+                if future is None:
+                    assembler.add_stored(path, arcname(path), stat.st_mtime, stat.st_mode & 0o777)
+                elif future == "stream":
+                    assembler.add_deflated(path, arcname(path), stat.st_mtime, stat.st_mode & 0o777, level)
+                else:
+                    crc, size, data = future.result()
+                    assembler.add(arcname(path), ZIP_DEFLATED, crc, size, data, stat.st_mtime, stat.st_mode & 0o777)
+                pbar.update(1)
+
+            for path in files:
+                if choose_method(path, policy) == ZIP_STORED:
+                    pending.append((path, None))  # Copied straight from disk by this process
+                elif os.path.getsize(path) >= STREAM_THRESHOLD:
+                    pending.append((path, "stream"))  # Too big to hold in memory, deflated here
+                else:
+                    pending.append((path, executor.submit(compress_member, path, level)))
+                if len(pending) >= workers * MAX_PENDING_PER_WORKER:
+                    write_next()
+            while pending:
+                write_next()
+
+        assembler.close()
+    except BaseException:
+        assembler.abort()
+        raise
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+
+from image_probe import probe_image
+from http_cache import normalize_url
+
+# URL -> probe result of every image checked so far, kept between runs
+MEMO_FILE = "image_probe_memo.json"
+
+# Results older than this many seconds are probed again
+MEMO_TTL = 7 * 24 * 3600
+
+# The memo is written after this many new results (and once more at exit)
+SAVE_EVERY = 100
+
+
+class ProbeMemo:
+    """
+    Persistent table of url -> (format, width, height, valid, checked_at).
+    valid is False when the URL answered but could not be read as an image.
+    Network errors are never memoized, so they are retried on the next lookup.
+    """
+
+    def __init__(self, path=MEMO_FILE, ttl=MEMO_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._url_locks = {}  # url -> [lock, threads holding or waiting for it]
+        self._pending = 0
+        try:
+            with open(path, "r", encoding="utf-8") as memo_file:
+                self._entries = json.load(memo_file)
+        except (OSError, ValueError):
+            self._entries = {}
+        self._evict_expired()
+        atexit.register(self.save)
+
+    def _evict_expired(self):
+        oldest = time.time() - self.ttl
+        for key in [key for key, entry in self._entries.items() if entry["checked_at"] < oldest]:
+            del self._entries[key]
+
+    def get(self, url):
+        """Return (found, info) where info is (format, width, height) or None."""
+        with self._lock:
+            entry = self._entries.get(normalize_url(url))
+        if entry is None or entry["checked_at"] < time.time() - self.ttl:
+            return False, None
+        if not entry["valid"]:
+            return True, None
+        return True, (entry["format"], entry["width"], entry["height"])
+
+    def put(self, url, info):
+        file_format, width, height = info if info is not None else (None, 0, 0)
+        with self._lock:
+            self._entries[normalize_url(url)] = {
+                "format": file_format, "width": width, "height": height,
+                "valid": info is not None, "checked_at": time.time(),
+            }
+            self._pending += 1
+            due = self._pending >= SAVE_EVERY
+        if due:
+            self.save()
+
+    @contextmanager
+    def url_lock(self, url):
+        """
+        Lock held while url is probed, so repeated images are fetched once.
+        The lock only exists while some thread holds or waits for it.
+        """
+        key = normalize_url(url)
+        with self._lock:
+            slot = self._url_locks.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+        try:
+            with slot[0]:
+                yield
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if not slot[1]:
+                    del self._url_locks[key]
+
+    def save(self):
+        with self._lock:
+            if not self._pending:
+                return
+            self._pending = 0
+            self._evict_expired()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as memo_file:
+                json.dump(self._entries, memo_file)
+            os.replace(tmp_path, self.path)
+
+
+_memo = None
+_memo_lock = threading.Lock()
+
+
+def get_memo():
+    """Return the process-wide probe memo, loading it on first use."""
+    global _memo
+    if _memo is None:
+        with _memo_lock:
+            if _memo is None:
+                _memo = ProbeMemo()
+    return _memo
+
+
+def probe_image_cached(url, timeout=10):
+    """probe_image() that answers from the memo when the URL was checked recently."""
+    memo = get_memo()
+    found, info = memo.get(url)
+    if found:
+        return info
+
+    # Site chrome (logos, avatars) shows up on every page: probe it once, others wait
+    with memo.url_lock(url):
+        found, info = memo.get(url)
+        if found:
+            return info
+        info = probe_image(url, timeout)
+        memo.put(url, info)
+    return info
@@ -0,0 +1,137 @@
+import os
+import json
+import threading
+from urllib.parse import urlparse, urljoin
+
+from http_session import get_session
+from link_parser import iter_tags
+
+# Per-domain decisions are kept here between runs
+RENDER_POLICY_FILE = "render_policy.json"
+
+# Pages per domain fetched both ways before deciding
+SAMPLE_PAGES = 2
+
+# The plain fetch must find at least this share of the rendered links
+MATCH_RATIO = 0.9
+
+
+def page_links(html, base_url):
+    """Every resolved <a href> and <img src> of a page, used to compare both passes."""
+    links = set()
+    for tag, attrs in iter_tags(html, ("a", "img")):
+        link = attrs.get("href" if tag == "a" else "src")
+        if link is not None:
+            links.add(urljoin(base_url, link))
+    return links
+
+
+class RenderPolicy:
+    """Remembers, per domain, whether pages need a real browser to show their links."""
+
+    def __init__(self, path=RENDER_POLICY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as policy_file:
+                self._domains = json.load(policy_file)
+        except (OSError, ValueError):
+            self._domains = {}
+        self._sampling = {}  # domain -> samples being taken right now
+
+    def needs_js(self, domain):
+        """True/False once decided, None while the domain is still being sampled."""
+        with self._lock:
+            return self._domains.get(domain, {}).get("needs_js")
+
+    def claim_sample(self, domain):
+        """
+        Reserve one of the SAMPLE_PAGES samples of an undecided domain. False once they are
+        all taken or in progress, so concurrent pages never record more than SAMPLE_PAGES.
+        """
+        with self._lock:
+            entry = self._domains.get(domain, {})
+            if entry.get("needs_js") is not None:
+                return False
+            if len(entry.get("ratios", [])) + self._sampling.get(domain, 0) >= SAMPLE_PAGES:
+                return False
+            self._sampling[domain] = self._sampling.get(domain, 0) + 1
+            return True
+
+    def release_sample(self, domain):
+        """Give back a claimed sample that could not be taken (e.g. the render failed)."""
+        with self._lock:
+            self._sampling[domain] -= 1
+
+    def record_sample(self, domain, static_links, rendered_links):
+        """Compare one page fetched both ways (under a claimed sample) and decide once enough are in."""
+        ratio = len(static_links & rendered_links) / len(rendered_links) if rendered_links else 1.0
+        with self._lock:
+            self._sampling[domain] = max(0, self._sampling.get(domain, 0) - 1)
+            entry = self._domains.setdefault(domain, {"ratios": []})
+            ratios = entry.setdefault("ratios", [])
+            if entry.get("needs_js") is not None or len(ratios) >= SAMPLE_PAGES:
+                return  # Already decided
+            ratios.append(round(ratio, 3))
+            if len(ratios) >= SAMPLE_PAGES:
+                entry["needs_js"] = min(entry["ratios"]) < MATCH_RATIO
+                print(f"{domain}: {'needs' if entry['needs_js'] else 'does not need'} JS rendering")
+                self._save()
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as policy_file:
+            json.dump(self._domains, policy_file, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def fetch_static(url):
+    """Plain HTTP fetch of a page, or None if it fails."""
+    try:
+        response = get_session().get(url, timeout=30)
+        response.raise_for_status()
+        return response.text
+    except Exception:
+        return None
+
+
+def fetch_page_source(url, render_page, policy, mode="auto"):
+    """
+    Return the HTML of url, skipping the browser whenever it is not needed.
+    mode="auto" uses the per-domain policy, sampling unknown domains both ways;
+    "always" renders every page with render_page(url); "never" only uses plain HTTP.
+    """
+    if mode == "always":
+        return render_page(url)
+    if mode == "never":
+        return fetch_static(url) or ""
+
+    domain = urlparse(url).netloc
+    needs_js = policy.needs_js(domain)
+
+    if needs_js is False:
+        html = fetch_static(url)
+        if html is not None:
+            return html
+        return render_page(url)  # The plain fetch failed, the browser may still get through
+
+    if needs_js is True:
+        return render_page(url)
+
+    # Undecided domain: fetch both ways and compare the links they expose, unless
+    # enough other pages of it are already being sampled (then just render)
+    if not policy.claim_sample(domain):
+        return render_page(url)
+    try:
+        static_html = fetch_static(url)
+        rendered_html = render_page(url) if static_html is not None else None
+    except BaseException:
+        policy.release_sample(domain)
+        raise
+    if static_html is None:
+        # A failed plain fetch (network error, non-200) says nothing about JS,
+        # so it is not counted as a sample
+        policy.release_sample(domain)
+        return render_page(url)
+    policy.record_sample(domain, page_links(static_html, url), page_links(rendered_html, url))
+    return rendered_html
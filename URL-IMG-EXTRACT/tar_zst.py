@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import tarfile
+
+from tqdm import tqdm  # Import tqdm for the progress bar
+
+# Optional dependency, only needed for .tar.zst output
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# zstd level (1-3 are much faster than deflate, 19 is the smallest)
+ZSTD_LEVEL = 3
+
+# Compression threads per archive; 0 uses every core
+ZSTD_THREADS = 0
+
+# Member name -> position in the archive, written next to it as <archive>.idx.json
+INDEX_SUFFIX = ".idx.json"
+
+READ_SIZE = 1024 * 1024
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise ImportError("tar.zst archives need the zstandard package (pip install zstandard)")
+
+
+class TarZstWriter:
+    """
+    Streaming .tar.zst writer. Every member is its own zstd frame, so the file is a normal
+    tar.zst (zstd -d | tar x works) while the index lets a single member be read back by
+    seeking straight to its frame. Nothing but the small index is kept in memory.
+    """
+
+    def __init__(self, archive_name, level=ZSTD_LEVEL, threads=ZSTD_THREADS):
+        _require_zstandard()
+        self.archive_name = archive_name
+        self.file = open(archive_name, "wb")
+        self.compressor = zstandard.ZstdCompressor(level=level, threads=threads or -1)
+        self.index = {}
+
+    def _add(self, arcname, size, mtime, mode, chunks):
+        info = tarfile.TarInfo(arcname)
+        info.size = size
+        info.mtime = int(mtime)
+        info.mode = mode
+
+        offset = self.file.tell()
+        written = 0
+        writer = self.compressor.stream_writer(self.file, size=-1, closefd=False)
+        writer.write(info.tobuf(format=tarfile.PAX_FORMAT))
+        for chunk in chunks:
+            writer.write(chunk)
+            written += len(chunk)
+        if written != size:
+            raise ValueError(f"{arcname} changed size while it was being archived")
+        writer.write(b"\0" * (-size % tarfile.BLOCKSIZE))  # Pad the member to a whole block
+        writer.flush(zstandard.FLUSH_FRAME)
+        self.index[arcname] = {"offset": offset, "length": self.file.tell() - offset, "size": size}
+
+    def add(self, path, arcname=None):
+        """Add a file from disk, streaming it through the compressor."""
+        stat = os.stat(path)
+
+        def chunks():
+            with open(path, "rb") as source:
+                while True:
+                    chunk = source.read(READ_SIZE)
+                    if not chunk:
+                        return
+                    yield chunk
+
+        self._add(arcname or os.path.basename(path), stat.st_size, stat.st_mtime, stat.st_mode & 0o777, chunks())
+
+    def add_bytes(self, arcname, data, mtime=None):
+        """Add a member whose content is already in memory (e.g. a downloaded body)."""
+        self._add(arcname, len(data), mtime or time.time(), 0o644, [data])
+
+    def close(self):
+        """Write the end-of-archive blocks and the index."""
+        writer = self.compressor.stream_writer(self.file, size=-1, closefd=False)
+        writer.write(b"\0" * (2 * tarfile.BLOCKSIZE))
+        writer.flush(zstandard.FLUSH_FRAME)
+        self.file.close()
+
+        tmp_path = self.archive_name + INDEX_SUFFIX + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as index_file:
+            json.dump(self.index, index_file)
+        os.replace(tmp_path, self.archive_name + INDEX_SUFFIX)
+
+    def abort(self):
+        """Drop a half-written archive."""
+        self.file.close()
+        os.remove(self.archive_name)
+
+
+def extract_member(archive_name, arcname, dest_path):
+    """Copy one member of a .tar.zst archive to dest_path, using its index to skip the rest."""
+    _require_zstandard()
+    with open(archive_name + INDEX_SUFFIX, "r", encoding="utf-8") as index_file:
+        entry = json.load(index_file)[arcname]
+
+    with open(archive_name, "rb") as archive:
+        archive.seek(entry["offset"])
+        frame = zstandard.ZstdDecompressor().stream_reader(archive, read_across_frames=False)
+        with tarfile.open(fileobj=frame, mode="r|") as tar:
+            member = tar.next()
+            source = tar.extractfile(member)
+            with open(dest_path, "wb") as dest:
+                while True:
+                    chunk = source.read(READ_SIZE)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+
+
+def tar_zst_files(files, archive_name, arcname=os.path.basename, level=ZSTD_LEVEL, threads=ZSTD_THREADS):
+    """Write files into a streaming .tar.zst archive with a seekable index."""
+    writer = TarZstWriter(archive_name, level, threads)
+    try:
+        for path in tqdm(files, desc="Archiving", unit="file"):
+            writer.add(path, arcname(path))
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
@@ -0,0 +1,23 @@
+import pytest
+
+import link_parser
+from link_parser import iter_tags
+
+BACKENDS = ["bs4"]
+if link_parser.etree is not None:
+    BACKENDS.append("lxml")
+if link_parser.SelectolaxParser is not None:
+    BACKENDS.append("selectolax")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("source", ["", b"", iter([]), "   ", "<!-- nothing -->"])
+def test_empty_page_has_no_tags(source, backend):
+    assert list(iter_tags(source, backend=backend)) == []
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_links_in_document_order(backend):
+    html = '<a href="/a">a</a><img src="b.jpg"><video><source src="c.mp4"></video>'
+    tags = [(tag, attrs.get("href") or attrs.get("src")) for tag, attrs in iter_tags(html, backend=backend)]
+    assert tags == [("a", "/a"), ("img", "b.jpg"), ("source", "c.mp4")]
@@ -1,21 +1,43 @@
 import os
+import shutil
 import requests
-from bs4 import BeautifulSoup
+from http_session import get_session  # Shared keep-alive connection pool
+from link_parser import iter_tags  # Fast targeted <a>/<img> extraction
 from urllib.parse import urlsplit, parse_qs
 import re
 from concurrent.futures import ThreadPoolExecutor  # For parallel downloading
 from tqdm import tqdm  # Import tqdm for the progress bar
+from stream_pipeline import stream_and_download  # Download while the page is still being parsed
+from async_downloader import download_all, MAX_IN_FLIGHT  # asyncio engine for large batches
+import partial_download  # .part files + sidecars for resumable downloads
+import content_store  # Optional content-addressed storage of downloaded files
+from http_cache import get_cache  # ETag/Last-Modified index for conditional refetches
+from segmented_download import download_segmented, supports_ranges, RangeNotSupported, SegmentCutShort, SEGMENTS, MIN_SEGMENTED_SIZE
+
+# Links ending in one of these extensions are treated as video links
+VIDEO_LINK_PATTERN = re.compile(r"\.(mp4|webm|mkv)$", re.IGNORECASE)
 
 # Step 1: Save the webpage source as index.html
 def save_page_source(url, filename="index.html"):
     try:
-        # Fetch the webpage content
-        response = requests.get(url)
+        # Fetch the webpage content, asking only for changes if an earlier copy is recorded
+        cache = get_cache()
+        cached_path = cache.cached_path(url)
+        headers = cache.conditional_headers(url) if cached_path else {}
+        response = get_session().get(url, headers=headers)
         response.raise_for_status()
 
+        if response.status_code == 304:
+            if os.path.abspath(cached_path) != os.path.abspath(filename):
+                shutil.copyfile(cached_path, filename)
+                cache.touch(url, filename)
+            print(f"Page unchanged since the last run, reusing {filename}.")
+            return
+
         # Save the page source as index.html
         with open(filename, "w", encoding="utf-8") as file:
             file.write(response.text)
+        cache.remember(url, filename, response.headers)
         print(f"Page source saved to {filename}.")
     except requests.exceptions.RequestException as e:
         print(f"Error fetching the website: {e}")
@@ -23,29 +45,27 @@ def save_page_source(url, filename="index.html"):
 # Step 2: Extract video links from the saved HTML page
 def extract_video_links_from_html(filename="index.html", max_videos=10):
     try:
-        with open(filename, "r", encoding="utf-8") as file:
-            soup = BeautifulSoup(file, "html.parser")
-        
-        # Find all anchor tags that contain video links
-        a_tags = soup.find_all("a", href=re.compile(r"\.(mp4|webm|mkv)$", re.IGNORECASE))
         valid_videos = []
         count = 0
 
-        for a_tag in a_tags:
-            if count >= max_videos:
-                break
-            video_url = a_tag.get("href")
-            if not video_url:
-                continue
-
-            # Handle relative URLs
-            if video_url.startswith("//"):
-                video_url = f"http:{video_url}"
-            elif video_url.startswith("/"):
-                video_url = f"{url.rstrip('/')}{video_url}"
-
-            valid_videos.append(video_url)
-            count += 1
+        with open(filename, "r", encoding="utf-8") as file:
+            # Find all anchor tags that contain video links. Only <a> tags are
+            # extracted, and parsing stops as soon as max_videos links are found
+            for _, attrs in iter_tags(file, ("a",)):
+                if count >= max_videos:
+                    break
+                video_url = attrs.get("href")
+                if not video_url or not VIDEO_LINK_PATTERN.search(video_url):
+                    continue
+
+                # Handle relative URLs
+                if video_url.startswith("//"):
+                    video_url = f"http:{video_url}"
+                elif video_url.startswith("/"):
+                    video_url = f"{url.rstrip('/')}{video_url}"
+
+                valid_videos.append(video_url)
+                count += 1
 
         return valid_videos
     except Exception as e:
@@ -135,53 +155,109 @@ def sanitize_filename(video_url):
     return filename
 
 # Step 5: Download video
-def download_video(video_url, download_folder="downloaded_videos"):
-    """Download video from the URL and save it to the specified folder."""
+def download_video(video_url, download_folder="downloaded_videos", segments=SEGMENTS, dedup=None):
+    """Download video from the URL and save it to the specified folder.
+    Large files served with Accept-Ranges are fetched as `segments` parallel byte ranges.
+    Data goes to a .part file first, so an interrupted download resumes on the next run.
+    dedup="hardlink" or "manifest" stores each unique content once (see content_store).
+    """
     if not os.path.exists(download_folder):
         os.makedirs(download_folder)
 
     try:
         print(f"Downloading {video_url}...")
 
-        # Add headers to simulate a browser request
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
+        # Get the sanitized video filename, reusing an unfinished .part of the same URL,
+        # otherwise adding a number to avoid overwriting. A copy saved by an earlier run
+        # keeps its name and is only fetched again if the server reports a change
+        cache = get_cache()
+        cached_path = cache.cached_path(video_url, download_folder)
+        video_name = sanitize_filename(video_url)  # Sanitize filename to keep the desired part
+        video_path = cached_path or partial_download.reserve_path(download_folder, video_name, video_url)
+        video_name = os.path.basename(video_path)
+
+        # Only ask for the missing bytes if an earlier run was interrupted
+        offset, resume_headers = partial_download.resume_request(video_path)
+        if cached_path and not offset:
+            resume_headers = cache.conditional_headers(video_url)
+        if offset:
+            print(f"Resuming {video_name} from byte {offset}.")
 
-        video_response = requests.get(video_url, headers=headers, stream=True)
+        video_response = get_session().get(video_url, headers=resume_headers, stream=True)
         video_response.raise_for_status()
 
+        if video_response.status_code == 304:
+            video_response.close()
+            print(f"{video_name} is unchanged since the last run, keeping it.")
+            return True
+
         # Check if the response content type is a video
         content_type = video_response.headers.get('Content-Type', '')
         if 'video' not in content_type:
             print(f"Skipping {video_url} (not a video).")
+            video_response.close()  # Hand the connection back to the pool
+            partial_download.discard(video_path)
             return False  # Return False if the video isn't downloaded
 
-        # Get the sanitized video filename
-        video_name = sanitize_filename(video_url)  # Sanitize filename to keep the desired part
-        video_path = os.path.join(download_folder, video_name)
-
-        # Check if filename exists already, then add a number to avoid overwriting
-        if os.path.exists(video_path):
-            base_name, ext = os.path.splitext(video_name)
-            counter = 1
-            while os.path.exists(video_path):
-                video_name = f"{base_name}_{counter}{ext}"
-                video_path = os.path.join(download_folder, video_name)
-                counter += 1
+        offset, total_size = partial_download.record_response(
+            video_path, video_url, video_response.status_code, video_response.headers, offset
+        )
+        total_size = total_size or 0
+
+        # Split large files into parallel byte ranges when the server allows it
+        if offset == 0 and segments > 1 and total_size >= MIN_SEGMENTED_SIZE and supports_ranges(video_response):
+            video_response.close()  # Each segment opens its own connection
+            meta = partial_download.load_meta(video_path)
+            try:
+                done_starts = partial_download.begin_segments(video_path, segments)
+                with tqdm(total=total_size, unit='B', unit_scale=True, desc=video_name) as pbar:
+                    download_segmented(
+                        video_url, partial_download.part_path(video_path), total_size, segments, pbar,
+                        done_starts=done_starts,
+                        on_segment_done=lambda start: partial_download.mark_segment_done(video_path, start),
+                        if_range=partial_download.if_range_validator(meta),
+                    )
+                partial_download.finish(video_path)
+                # Segments arrive out of order, so the finished file is hashed in one pass
+                if dedup and content_store.store(video_path, None, video_url, dedup):
+                    print(f"Saved {video_name} to {download_folder} (same content as an earlier file, stored once).")
+                else:
+                    print(f"Saved {video_name} to {download_folder}.")
+                cache.remember(video_url, video_path, video_response.headers)
+                return True
+            except (RangeNotSupported, SegmentCutShort) as e:
+                # Only when ranges cannot work here; a network error is raised as usual and
+                # the finished segments are resumed on the next run
+                print(f"Segmented download of {video_url} failed ({e}), retrying as a single stream.")
+                partial_download.end_segments(video_path)
+                video_response = get_session().get(video_url, stream=True)
+                video_response.raise_for_status()
+                offset, total_size = partial_download.record_response(
+                    video_path, video_url, video_response.status_code, video_response.headers, 0
+                )
+                total_size = total_size or 0
 
         # Download video with progress bar
-        with open(video_path, "wb") as video_file:
-            total_size = int(video_response.headers.get('Content-Length', 0))
+        open_part = content_store.open_part if dedup else partial_download.open_part
+        with open_part(video_path, offset) as video_file:
             chunk_size = 1024  # Download in 1k chunks
-            with tqdm(total=total_size, unit='B', unit_scale=True, desc=video_name) as pbar:
+            with tqdm(total=total_size, initial=offset, unit='B', unit_scale=True, desc=video_name) as pbar:
                 for chunk in video_response.iter_content(chunk_size=chunk_size):
                     video_file.write(chunk)
                     pbar.update(len(chunk))
 
-        print(f"Saved {video_name} to {download_folder}.")
+        if not partial_download.is_complete(video_path):
+            print(f"Download of {video_url} was cut short, it will resume on the next run.")
+            return False
+
+        partial_download.finish(video_path)
+        if dedup and content_store.store(video_path, video_file.hexdigest(), video_url, dedup):
+            print(f"Saved {video_name} to {download_folder} (same content as an earlier file, stored once).")
+        else:
+            print(f"Saved {video_name} to {download_folder}.")
+        cache.remember(video_url, video_path, video_response.headers)  # Revalidate instead of refetching next time
         return True  # Return True if download was successful
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, OSError, ValueError) as e:
         print(f"Error downloading {video_url}: {e}")
         return False  # Return False if download failed
 
@@ -200,14 +276,25 @@ def ask_user_to_download_video(video_url):
         return ask_user_to_download_video(video_url)
 
 # Step 7: Download selected videos concurrently
-def download_videos_concurrently(selected_videos, download_folder="downloaded_videos"):
-    """Download multiple videos concurrently with a progress bar."""
+def download_videos_concurrently(selected_videos, download_folder="downloaded_videos", engine="asyncio", max_in_flight=MAX_IN_FLIGHT, dedup=None):
+    """Download multiple videos concurrently with a progress bar.
+    engine="asyncio" keeps up to max_in_flight transfers open on one event loop,
+    engine="threads" uses the original 5-worker thread pool.
+    """
+    if engine == "asyncio":
+        # Large videos are handed back to download_video so they get segmented Range downloads
+        return download_all(
+            selected_videos, download_folder, "video", sanitize_filename, max_in_flight,
+            large_file_handler=lambda video_url: download_video(video_url, download_folder, dedup=dedup),
+            large_file_threshold=MIN_SEGMENTED_SIZE, dedup=dedup,
+        )
+
     downloaded_count = 0  # Counter for successfully downloaded videos
 
     # Using ThreadPoolExecutor to download videos concurrently
     with ThreadPoolExecutor(max_workers=5) as executor:
         # Track successful downloads
-        for success in executor.map(lambda video_url: download_video(video_url, download_folder), selected_videos):
+        for success in executor.map(lambda video_url: download_video(video_url, download_folder, dedup=dedup), selected_videos):
             if success:
                 downloaded_count += 1
 
@@ -220,28 +307,42 @@ if __name__ == "__main__":
 
     # Customizable parameters
     max_videos = 0  # Maximum number of videos to extract
+    download_engine = "asyncio"  # "asyncio" (hundreds of transfers in flight) or "threads" (5 workers)
+    stream_mode = False  # Download every video link while the page is parsed (no prompts, max_videos = 0 means no limit)
+    dedup_mode = None  # None, "hardlink" or "manifest": store identical files only once
+
+    if stream_mode:
+        # Parse the page as it arrives and start each download as soon as its link is found
+        try:
+            downloaded_count, found_count = stream_and_download(
+                website_url, VIDEO_LINK_PATTERN, lambda video_url: download_video(video_url, dedup=dedup_mode),
+                max_videos, save_as="index.html",
+            )
+            print(f"\nTotal videos downloaded: ({downloaded_count}/{found_count})")
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching the website: {e}")
+    else:
+        # Step 1: Save the webpage source as index.html
+        save_page_source(website_url)
 
-    # Step 1: Save the webpage source as index.html
-    save_page_source(website_url)
-
-    # Step 2: Extract video links from the saved index.html
-    video_links = extract_video_links_from_html("index.html", max_videos)
+        # Step 2: Extract video links from the saved index.html
+        video_links = extract_video_links_from_html("index.html", max_videos)
 
-    # Step 3: Save the extracted videos to videos.html
-    save_videos_to_html(video_links)
+        # Step 3: Save the extracted videos to videos.html
+        save_videos_to_html(video_links)
 
-    # Step 4: Ask the user for each video whether to download it
-    selected_videos = []
-    for video_url in video_links:
-        result = ask_user_to_download_video(video_url)
-        if result:
-            selected_videos.append(result)
+        # Step 4: Ask the user for each video whether to download it
+        selected_videos = []
+        for video_url in video_links:
+            result = ask_user_to_download_video(video_url)
+            if result:
+                selected_videos.append(result)
 
-    # Step 5: Download selected videos concurrently with progress bar
-    if selected_videos:
-        downloaded_count = download_videos_concurrently(selected_videos)
+        # Step 5: Download selected videos concurrently with progress bar
+        if selected_videos:
+            downloaded_count = download_videos_concurrently(selected_videos, engine=download_engine, dedup=dedup_mode)
 
-        # Print the total number of videos downloaded
-        print(f"\nTotal videos downloaded: ({downloaded_count}/{len(selected_videos)})")
+            # Print the total number of videos downloaded
+            print(f"\nTotal videos downloaded: ({downloaded_count}/{len(selected_videos)})")
 
     print("Script finished.")
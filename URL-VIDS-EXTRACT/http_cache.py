@@ -0,0 +1,168 @@
+import os
+import json
+import shutil
+import atexit
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import content_store
+from http_session import get_session
+
+# URL -> validators and local copy of every page/file fetched so far, kept between runs
+CACHE_FILE = "http_cache.json"
+
+# The index is written after this many updates (and once more at exit)
+SAVE_EVERY = 50
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _local_stat(path):
+    """os.stat of path, or of its blob if it only exists in a content store manifest."""
+    try:
+        return os.stat(path)
+    except OSError:
+        pass
+    blob = content_store.resolve(path)
+    try:
+        return os.stat(blob) if blob else None
+    except OSError:
+        return None
+
+
+def normalize_url(url):
+    """Canonical cache key: lowercase scheme/host, no default port or fragment, sorted query."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+class ValidationCache:
+    """
+    On-disk index of ETag / Last-Modified per URL, used to turn refetches of unchanged
+    resources into conditional requests answered with 304 Not Modified.
+    An entry is only trusted while its local file (or, for a name only kept in a content
+    store manifest, its blob) still has the recorded size and mtime.
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = 0
+        try:
+            with open(path, "r", encoding="utf-8") as cache_file:
+                self._entries = json.load(cache_file)
+        except (OSError, ValueError):
+            self._entries = {}
+        atexit.register(self.save)
+
+    def cached_path(self, url, folder=None):
+        """Local copy of url if it is still intact (and, if given, lives in folder)."""
+        with self._lock:
+            entry = self._entries.get(normalize_url(url))
+        if not entry or not (entry.get("etag") or entry.get("last_modified")):
+            return None
+
+        path = entry["path"]
+        if folder is not None and os.path.abspath(os.path.dirname(path)) != os.path.abspath(folder):
+            return None
+        stat = _local_stat(path)  # A manifest-mode name is checked through its blob
+        if stat is None:
+            return None
+        if stat.st_size != entry.get("length") or stat.st_mtime_ns != entry.get("mtime_ns"):
+            return None  # Changed or replaced locally since it was recorded
+        return path
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since headers for the recorded validators of url."""
+        with self._lock:
+            entry = self._entries.get(normalize_url(url)) or {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def remember(self, url, path, headers):
+        """Record the validators of a response whose body is now stored at path."""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        key = normalize_url(url)
+        with self._lock:
+            stat = _local_stat(path)
+            if stat is None or not (etag or last_modified):
+                self._entries.pop(key, None)  # Nothing to revalidate with
+            else:
+                self._entries[key] = {
+                    "etag": etag, "last_modified": last_modified, "path": path,
+                    "length": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                }
+            self._pending += 1
+            due = self._pending >= SAVE_EVERY
+        if due:
+            self.save()
+
+    def touch(self, url, path):
+        """Refresh the recorded size/mtime of path after a 304 (e.g. it was copied there)."""
+        key = normalize_url(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stat = os.stat(path)
+                entry.update(path=path, length=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                self._pending += 1
+
+    def save(self):
+        with self._lock:
+            if not self._pending:
+                return
+            self._pending = 0
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as cache_file:
+                json.dump(self._entries, cache_file)
+            os.replace(tmp_path, self.path)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide validation cache, loading it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ValidationCache()
+    return _cache
+
+
+def fetch_to_file(url, path, timeout=30):
+    """
+    Download url to path unless the copy recorded for url is still current.
+    Returns True when a 304 confirmed the existing copy, False after a full download.
+    """
+    cache = get_cache()
+    cached_path = cache.cached_path(url)
+    headers = cache.conditional_headers(url) if cached_path else {}
+
+    with get_session().get(url, headers=headers, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        if response.status_code == 304:
+            if os.path.abspath(cached_path) != os.path.abspath(path):
+                shutil.copyfile(cached_path, path)
+                cache.touch(url, path)
+            return True
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                file.write(chunk)
+        os.replace(tmp_path, path)
+        cache.remember(url, path, response.headers)
+    return False
@@ -0,0 +1,79 @@
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Headers sent with every request made through the shared session
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "*/*",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+# Number of hosts whose connection pools are kept alive at the same time
+POOL_CONNECTIONS = 10
+
+# Default number of keep-alive connections kept open per host
+POOL_MAXSIZE = 10
+
+# Per-host pool sizes, e.g. {"cdn.example.com": 50} for a gallery CDN
+HOST_POOL_SIZES = {}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _mount_host(session, host, pool_size):
+    """Mount a dedicated connection pool for one host on both schemes."""
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount(f"http://{host}/", adapter)
+    session.mount(f"https://{host}/", adapter)
+
+
+def get_session():
+    """Return the process-wide requests session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers.update(DEFAULT_HEADERS)
+
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+
+                for host, pool_size in HOST_POOL_SIZES.items():
+                    _mount_host(session, host, pool_size)
+
+                _session = session
+    return _session
+
+
+def set_host_pool_size(host_or_url, pool_size):
+    """Give one host its own pool size, e.g. to match the worker count hitting a CDN."""
+    host = urlsplit(host_or_url).netloc or host_or_url
+    session = get_session()
+    with _session_lock:
+        if HOST_POOL_SIZES.get(host) == pool_size:
+            return  # Already mounted with this size, keep its open connections
+        HOST_POOL_SIZES[host] = pool_size
+        _mount_host(session, host, pool_size)
+
+
+def ensure_host_pool_size(host_or_url, min_size):
+    """Grow a host's pool to at least min_size connections, never shrink it."""
+    host = urlsplit(host_or_url).netloc or host_or_url
+    if HOST_POOL_SIZES.get(host, POOL_MAXSIZE) < min_size:
+        set_host_pool_size(host, min_size)
+
+
+def close_session():
+    """Close every pooled connection (call once at the end of a run)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,194 @@
+import os
+import re
+import json
+
+# Unfinished downloads live next to their final name as name.ext.part,
+# with a name.ext.part.json sidecar holding the URL, validators and length
+PART_SUFFIX = ".part"
+META_SUFFIX = ".part.json"
+
+
+def part_path(final_path):
+    return final_path + PART_SUFFIX
+
+
+def meta_path(final_path):
+    return final_path + META_SUFFIX
+
+
+def load_meta(final_path):
+    """Read the sidecar of final_path, or None if there is no (readable) sidecar."""
+    try:
+        with open(meta_path(final_path), "r", encoding="utf-8") as meta_file:
+            return json.load(meta_file)
+    except (OSError, ValueError):
+        return None
+
+
+def save_meta(final_path, meta):
+    """Write the sidecar atomically so a crash never leaves half a JSON file."""
+    tmp_path = meta_path(final_path) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as meta_file:
+        json.dump(meta, meta_file)
+    os.replace(tmp_path, meta_path(final_path))
+
+
+def reserve_path(download_folder, file_name, url):
+    """
+    Pick the final path for url. An unfinished download of the same URL is reused,
+    otherwise the first free name is taken, adding _1, _2... on collision.
+    The name is claimed right away by creating its sidecar exclusively, so two threads
+    (or processes) never get the same name for different URLs.
+    """
+    base_name, ext = os.path.splitext(file_name)
+    candidate = file_name
+    counter = 1
+    while True:
+        final_path = os.path.join(download_folder, candidate)
+
+        meta = load_meta(final_path)
+        if meta is not None and meta.get("url") == url:
+            return final_path  # Resume the earlier attempt
+
+        if not (os.path.exists(final_path) or os.path.exists(part_path(final_path))) and _claim(final_path, url):
+            return final_path
+
+        candidate = f"{base_name}_{counter}{ext}"
+        counter += 1
+
+
+def _claim(final_path, url):
+    """Create the sidecar of final_path only if it does not exist yet; False if it does."""
+    try:
+        fd = os.open(meta_path(final_path), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w", encoding="utf-8") as meta_file:
+        json.dump({"url": url}, meta_file)
+    return True
+
+
+def resume_request(final_path):
+    """
+    Return (offset, headers) for continuing an interrupted download of final_path.
+    offset is 0 and headers empty when there is nothing safe to resume.
+    """
+    meta = load_meta(final_path)
+    if not meta or "segments" in meta or not os.path.exists(part_path(final_path)):
+        return 0, {}
+
+    offset = os.path.getsize(part_path(final_path))
+    length = meta.get("length")
+    if offset == 0 or (length and offset >= length):
+        return 0, {}
+
+    # If-Range makes the server send the whole file again if it changed meanwhile
+    validator = if_range_validator(meta)
+    if not validator:
+        return 0, {}
+
+    return offset, {"Range": f"bytes={offset}-", "If-Range": validator}
+
+
+def if_range_validator(meta):
+    """Pick the value for an If-Range header: a strong ETag, else Last-Modified."""
+    etag = meta.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return meta.get("last_modified")
+
+
+def record_response(final_path, url, status_code, headers, offset):
+    """
+    Store the response validators and total length in the sidecar.
+    Returns (offset, length): offset drops back to 0 when the server sent the full body.
+    """
+    old_meta = load_meta(final_path) or {}
+    etag = headers.get("ETag")
+    last_modified = headers.get("Last-Modified")
+
+    if status_code == 206:
+        match = re.match(r"bytes (\d+)-\d+/(\d+|\*)", headers.get("Content-Range", ""))
+        if not match or int(match.group(1)) != offset:
+            raise ValueError(f"Unexpected Content-Range for {url}: {headers.get('Content-Range')}")
+        length = int(match.group(2)) if match.group(2) != "*" else None
+    else:
+        offset = 0
+        length = int(headers.get("Content-Length", 0)) or None
+
+    if headers.get("Content-Encoding", "identity") != "identity":
+        length = None  # Content-Length counts the encoded bytes, not what lands on disk
+
+    meta = {"url": url, "etag": etag, "last_modified": last_modified, "length": length}
+
+    # Segment progress only carries over while the remote file is provably unchanged
+    same_file = (etag or last_modified) and (
+        (old_meta.get("etag"), old_meta.get("last_modified"), old_meta.get("length"))
+        == (etag, last_modified, length)
+    )
+    if same_file and "segments" in old_meta:
+        meta["segments"] = old_meta["segments"]
+        meta["segments_done"] = old_meta.get("segments_done", [])
+
+    save_meta(final_path, meta)
+    return offset, length
+
+
+def open_part(final_path, offset):
+    """Open the .part file for appending at offset, or truncate it when starting over."""
+    return open(part_path(final_path), "ab" if offset else "wb")
+
+
+def is_complete(final_path):
+    """Check the .part file against the length recorded in the sidecar (if any)."""
+    meta = load_meta(final_path) or {}
+    length = meta.get("length")
+    return not length or os.path.getsize(part_path(final_path)) == length
+
+
+def begin_segments(final_path, segments):
+    """Record a segmented download in the sidecar; return the segment starts already finished."""
+    meta = load_meta(final_path) or {}
+    if meta.get("segments") == segments:
+        return set(meta.get("segments_done", []))
+
+    meta["segments"] = segments
+    meta["segments_done"] = []
+    save_meta(final_path, meta)
+    return set()
+
+
+def mark_segment_done(final_path, start):
+    meta = load_meta(final_path) or {}
+    meta.setdefault("segments_done", []).append(start)
+    save_meta(final_path, meta)
+
+
+def end_segments(final_path):
+    """Forget segment progress, e.g. before falling back to a single stream."""
+    meta = load_meta(final_path) or {}
+    meta.pop("segments", None)
+    meta.pop("segments_done", None)
+    save_meta(final_path, meta)
+
+
+def finish(final_path):
+    """Move the finished .part file to its final name and drop the sidecar."""
+    os.replace(part_path(final_path), final_path)
+    discard_meta(final_path)
+
+
+def discard_meta(final_path):
+    try:
+        os.remove(meta_path(final_path))
+    except OSError:
+        pass
+
+
+def discard(final_path):
+    """Forget a reserved name entirely (e.g. the URL turned out not to be media)."""
+    try:
+        os.remove(part_path(final_path))
+    except OSError:
+        pass
+    discard_meta(final_path)
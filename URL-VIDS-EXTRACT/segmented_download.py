@@ -0,0 +1,108 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from http_session import get_session, ensure_host_pool_size
+
+# Number of byte ranges fetched in parallel for one file
+SEGMENTS = 8
+
+# Files smaller than this are not worth splitting
+MIN_SEGMENTED_SIZE = 16 * 1024 * 1024
+
+CHUNK_SIZE = 256 * 1024
+
+
+class RangeNotSupported(Exception):
+    """Raised when the server ignores a Range request."""
+
+
+class SegmentCutShort(IOError):
+    """Raised when a Range response ends without error but with fewer bytes than asked for."""
+
+
+def supports_ranges(response):
+    """Check whether a response advertises byte ranges for an uncompressed body of known size."""
+    return (
+        response.headers.get("Accept-Ranges", "").lower() == "bytes"
+        and int(response.headers.get("Content-Length", 0)) > 0
+        and response.headers.get("Content-Encoding", "identity") == "identity"
+    )
+
+
+def split_ranges(total_size, segments):
+    """Split [0, total_size) into `segments` inclusive (start, end) byte ranges."""
+    segment_size = -(-total_size // segments)  # ceiling division
+    return [
+        (start, min(start + segment_size, total_size) - 1)
+        for start in range(0, total_size, segment_size)
+    ]
+
+
+def _fetch_range(url, file_path, start, end, pbar, if_range):
+    """Fetch bytes start..end of url and write them at the same offset of file_path."""
+    headers = {"Range": f"bytes={start}-{end}"}
+    if if_range:
+        headers["If-Range"] = if_range  # A changed file comes back as 200 and aborts the segments
+    with get_session().get(url, headers=headers, stream=True) as response:
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise RangeNotSupported(f"{url} answered {response.status_code} to a Range request")
+
+        written = 0
+        with open(file_path, "r+b") as out_file:
+            out_file.seek(start)
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                out_file.write(chunk)
+                written += len(chunk)
+                if pbar is not None:
+                    pbar.update(len(chunk))
+
+    if written != end - start + 1:
+        raise SegmentCutShort(f"Range {start}-{end} of {url} was cut short ({written} bytes)")
+
+
+def download_segmented(url, file_path, total_size, segments=SEGMENTS, pbar=None,
+                       done_starts=(), on_segment_done=None, if_range=None):
+    """
+    Download url into file_path as `segments` concurrent Range requests.
+    The file is preallocated to total_size and each segment is written at its own offset.
+    Segments whose start is in done_starts are skipped when resuming an existing file,
+    and on_segment_done(start) is called as each remaining one finishes.
+    Raises RangeNotSupported if the server does not honour the ranges, SegmentCutShort if
+    it sends less than asked for; network errors are raised as they are (e.g. requests'
+    RequestException), leaving the finished segments recorded for a retry.
+    """
+    # Make sure the host pool can hold one keep-alive connection per segment
+    ensure_host_pool_size(url, segments)
+
+    # Preallocate the file so every segment can seek straight to its offset
+    if not (os.path.exists(file_path) and os.path.getsize(file_path) == total_size):
+        with open(file_path, "wb") as out_file:
+            out_file.truncate(total_size)
+        done_starts = ()
+
+    pending = []
+    for start, end in split_ranges(total_size, segments):
+        if start in done_starts:
+            if pbar is not None:
+                pbar.update(end - start + 1)
+        else:
+            pending.append((start, end))
+
+    first_error = None
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        futures = {
+            executor.submit(_fetch_range, url, file_path, start, end, pbar, if_range): start
+            for start, end in pending
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                first_error = first_error or e
+                continue
+            if on_segment_done is not None:
+                on_segment_done(futures[future])
+
+    if first_error is not None:
+        raise first_error  # Finished segments stay recorded for the next attempt
@@ -0,0 +1,67 @@
+from contextlib import closing
+from urllib.parse import urljoin, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+from http_session import get_session, ensure_host_pool_size
+from link_parser import iter_tags, FEED_SIZE
+
+# Downloads running while the page is still being fetched and parsed
+STREAM_WORKERS = 16
+
+
+def _tee(chunks, filename):
+    """Pass chunks through while also writing them to filename."""
+    with open(filename, "w", encoding="utf-8") as file:
+        for chunk in chunks:
+            file.write(chunk)
+            yield chunk
+
+
+def stream_media_links(page_url, link_pattern, save_as=None):
+    """
+    Yield the absolute URL of every <a href> matching link_pattern while the page is
+    still downloading. The page is parsed chunk by chunk and never re-read from disk;
+    save_as optionally keeps a copy of the source (e.g. "index.html") for reference.
+    """
+    with get_session().get(page_url, stream=True) as response:
+        response.raise_for_status()
+        response.encoding = response.encoding or "utf-8"
+
+        chunks = response.iter_content(chunk_size=FEED_SIZE, decode_unicode=True)
+        if save_as:
+            chunks = _tee(chunks, save_as)
+
+        for _, attrs in iter_tags(chunks, ("a",)):
+            href = attrs.get("href")
+            if href and link_pattern.search(href):
+                yield urljoin(page_url, href)
+
+
+def stream_and_download(page_url, link_pattern, download, max_links=0, workers=STREAM_WORKERS, save_as=None):
+    """
+    Fetch page_url and hand every matching link to download(url) the moment it is parsed,
+    so downloads overlap with the page transfer. max_links=0 means no limit.
+    Returns (successful downloads, links found).
+    """
+    # Room in the host pools for every worker plus the page stream, so no keep-alive
+    # connection is thrown away as "pool is full"
+    ensure_host_pool_size(page_url, workers + 1)
+    hosts = {urlsplit(page_url).netloc}
+
+    seen = set()
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            closing(stream_media_links(page_url, link_pattern, save_as)) as links:
+        for link in links:
+            if link in seen:
+                continue
+            seen.add(link)
+            host = urlsplit(link).netloc
+            if host not in hosts:
+                hosts.add(host)
+                ensure_host_pool_size(host, workers)
+            futures.append(executor.submit(download, link))
+            if max_links and len(seen) >= max_links:
+                break  # Stop fetching and parsing the rest of the page
+
+    return sum(1 for future in futures if future.result()), len(futures)